@@ -49,6 +49,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'emailChatbot.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'chatbot.urls'
@@ -121,7 +122,45 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'chatbot/static')]
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
+# Caches
+# Ranked result sets must be visible to every worker process, so they get a shared
+# backend; point EMAIL_CHATBOT_RESULTS_DIR at shared storage or swap in Redis/DB here.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'results': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('EMAIL_CHATBOT_RESULTS_DIR', os.path.join(BASE_DIR, 'results_cache')),
+        'TIMEOUT': 900,
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# LLM routing for the email chatbot. Set EMAIL_CHATBOT_LLM_BASE_URL to use any
+# OpenAI-compatible server (e.g. a local stand-in) instead of Groq.
+
+EMAIL_CHATBOT_LLM = {
+    'BASE_URL': os.environ.get('EMAIL_CHATBOT_LLM_BASE_URL', ''),
+    'API_KEY': os.environ.get('EMAIL_CHATBOT_LLM_API_KEY', ''),
+    'FAST_MODEL': os.environ.get('EMAIL_CHATBOT_LLM_FAST_MODEL', 'llama3-8b-8192'),
+    'FAST_CONTEXT': int(os.environ.get('EMAIL_CHATBOT_LLM_FAST_CONTEXT', 8192)),
+    'LARGE_MODEL': os.environ.get('EMAIL_CHATBOT_LLM_LARGE_MODEL', 'llama-3.3-70b-versatile'),
+    'LARGE_CONTEXT': int(os.environ.get('EMAIL_CHATBOT_LLM_LARGE_CONTEXT', 131072)),
+    'COMPLEXITY_THRESHOLD': int(os.environ.get('EMAIL_CHATBOT_LLM_COMPLEXITY_THRESHOLD', 4)),
+}
+
+# Directory holding memory-mapped mailbox snapshots shared by all workers.
+# Publish a new generation with `python manage.py build_mailbox_index`.
+
+EMAIL_CHATBOT_INDEX_DIR = os.environ.get('EMAIL_CHATBOT_INDEX_DIR', '')
+
+# Staff can profile a single request by sending "X-Profile: 1"; artifacts are
+# saved here and downloaded from /profiles/<id>/. Leave empty to disable.
+
+EMAIL_CHATBOT_PROFILE_DIR = os.environ.get('EMAIL_CHATBOT_PROFILE_DIR', '')
@@ -0,0 +1,197 @@
+import json
+import math
+import os
+import re
+import struct
+import threading
+import zlib
+from array import array
+from email.utils import parseaddr
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+from .snapshot import tokenize
+
+BULK = 'bulk'
+PERSONAL = 'personal'
+CLASSIFIER_FILE = 'CLASSIFIER'
+BULK_PRECEDENCE = {'bulk', 'list', 'junk'}
+# Only nouns that name bulk mail itself; "sales" or "offer" are just as likely to be about a person
+BULK_QUERY = re.compile(
+    r"\b(newsletters?|promos?|promotions?|promotional|notifications?|alerts?|mailing lists?|"
+    r"marketing (e-?)?mails?|unsubscribe|digests?|spam|bulk (e-?)?mail)\b",
+    re.IGNORECASE
+)
+
+
+def header_signal(email_message) -> str:
+    """
+    Name the first header marking a message as bulk or automated mail, or '' if there is none
+    """
+    if email_message['List-Unsubscribe']:
+        return 'list-unsubscribe'
+    if email_message['List-Id']:
+        return 'list-id'
+    precedence = (email_message['Precedence'] or '').strip().lower()
+    if precedence in BULK_PRECEDENCE:
+        return f"precedence:{precedence}"
+    auto_submitted = (email_message['Auto-Submitted'] or '').strip().lower()
+    if auto_submitted and auto_submitted != 'no':
+        return 'auto-submitted'
+    return ''
+
+
+def wants_bulk(user_input: str) -> bool:
+    """
+    Whether the query explicitly asks for newsletters, promotions, notifications or alerts
+    """
+    return bool(BULK_QUERY.search(user_input or ''))
+
+
+class BulkMailClassifier:
+    def __init__(self, buckets: int = 1 << 16, threshold: float = 0.9):
+        """
+        Label mail as bulk or personal from list headers, sender reputation within the
+        mailbox, and a naive Bayes model over hashed words trained on the header labels
+        """
+        self.buckets = buckets
+        self.threshold = threshold
+        self.word_counts = {label: array('I', bytes(4 * buckets)) for label in (BULK, PERSONAL)}
+        self.word_totals = {BULK: 0, PERSONAL: 0}
+        self.doc_counts = {BULK: 0, PERSONAL: 0}
+        self.senders: Dict[str, List[int]] = {}
+        # A model loaded from the index dir is shared by every request, so it is never updated
+        self.frozen = False
+
+    def label(self, emails: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """
+        Set 'category' on each email; unless frozen, header-marked mail also trains the model for the rest
+        """
+        if not self.frozen:
+            for email in emails:
+                address = self._address(email)
+                seen = self.senders.setdefault(address, [0, 0])
+                seen[0] += 1
+                seen[1] += bool(email.get('bulk_signal'))
+                # Mail without list headers is only a weak personal example, but it balances the model
+                self._learn(email, BULK if email.get('bulk_signal') else PERSONAL)
+
+        for email in emails:
+            email['category'] = self.predict(email)
+        return emails
+
+    def predict(self, email: Dict[str, str]) -> str:
+        if email.get('bulk_signal'):
+            return BULK
+
+        total, bulk = self.senders.get(self._address(email), (0, 0))
+        if total >= 3 and bulk / total >= 0.8:
+            return BULK
+
+        probability = self.bulk_probability(email)
+        if probability is not None and probability >= self.threshold:
+            return BULK
+        return PERSONAL
+
+    def bulk_probability(self, email: Dict[str, str]) -> Optional[float]:
+        """
+        Naive Bayes P(bulk | words), or None until both classes have examples
+        """
+        if not self.doc_counts[BULK] or not self.doc_counts[PERSONAL]:
+            return None
+
+        documents = self.doc_counts[BULK] + self.doc_counts[PERSONAL]
+        scores = {}
+        for label in (BULK, PERSONAL):
+            counts = self.word_counts[label]
+            denominator = self.word_totals[label] + self.buckets
+            score = math.log(self.doc_counts[label] / documents)
+            for feature in self._features(email):
+                score += math.log((counts[feature] + 1) / denominator)
+            scores[label] = score
+
+        difference = max(-50.0, min(50.0, scores[PERSONAL] - scores[BULK]))
+        return 1 / (1 + math.exp(difference))
+
+    def _learn(self, email: Dict[str, str], label: str):
+        counts = self.word_counts[label]
+        features = self._features(email)
+        for feature in features:
+            counts[feature] += 1
+        self.word_totals[label] += len(features)
+        self.doc_counts[label] += 1
+
+    def _features(self, email: Dict[str, str]) -> List[int]:
+        address = self._address(email)
+        tokens = set(tokenize(f"{email.get('subject', '')} {email.get('body', '')}"))
+        tokens.add(f"domain:{address.rpartition('@')[2]}")
+        return [zlib.crc32(token.encode('utf-8')) % self.buckets for token in tokens]
+
+    def _address(self, email: Dict[str, str]) -> str:
+        return parseaddr(email.get('sender', ''))[1].lower()
+
+    def save(self, path: str):
+        """
+        Write the word counts and sender reputation next to the snapshots
+        """
+        meta = json.dumps({
+            'buckets': self.buckets,
+            'threshold': self.threshold,
+            'word_totals': self.word_totals,
+            'doc_counts': self.doc_counts,
+            'senders': self.senders
+        }).encode('utf-8')
+        with open(path + '.tmp', 'wb') as handle:
+            handle.write(struct.pack('<I', len(meta)) + meta)
+            for label in (BULK, PERSONAL):
+                handle.write(self.word_counts[label].tobytes())
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path: str) -> 'BulkMailClassifier':
+        """
+        Read a model written by save(); the result is frozen
+        """
+        with open(path, 'rb') as handle:
+            data = handle.read()
+        meta_size, = struct.unpack_from('<I', data, 0)
+        meta = json.loads(data[4:4 + meta_size])
+
+        classifier = cls(meta['buckets'], meta['threshold'])
+        offset, size = 4 + meta_size, 4 * meta['buckets']
+        for label in (BULK, PERSONAL):
+            classifier.word_counts[label] = array('I', data[offset:offset + size])
+            offset += size
+        classifier.word_totals = meta['word_totals']
+        classifier.doc_counts = meta['doc_counts']
+        classifier.senders = meta['senders']
+        classifier.frozen = True
+        return classifier
+
+
+_loaded = {'key': None, 'classifier': None}
+_loaded_lock = threading.Lock()
+
+
+def load_classifier() -> Optional[BulkMailClassifier]:
+    """
+    The model trained on the whole mailbox by build_mailbox_index, reloaded when it changes
+    """
+    index_dir = getattr(settings, 'EMAIL_CHATBOT_INDEX_DIR', '')
+    if not index_dir:
+        return None
+    path = os.path.join(index_dir, CLASSIFIER_FILE)
+    try:
+        key = (path, os.stat(path).st_mtime_ns)
+    except OSError:
+        return None
+
+    with _loaded_lock:
+        if _loaded['key'] != key:
+            try:
+                _loaded['classifier'] = BulkMailClassifier.load(path)
+                _loaded['key'] = key
+            except (OSError, ValueError, KeyError, struct.error) as e:
+                print(f"Classifier load error: {e}")
+        return _loaded['classifier']
@@ -0,0 +1,167 @@
+import json
+import os
+import threading
+import zlib
+from collections import Counter
+from typing import List, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+DICTIONARY_FILE = 'DICTIONARY'
+# zlib only looks back 32 KiB, so a larger preset dictionary would be wasted
+ZLIB_DICTIONARY_SIZE = 32 * 1024
+
+
+class BodyCodec:
+    def __init__(self, kind: int = CODEC_NONE, dictionary: bytes = b''):
+        """
+        Compress and decompress single email bodies against a shared dictionary
+        """
+        if kind == CODEC_ZSTD and zstandard is None:
+            raise ValueError("Snapshot bodies use zstd but the zstandard package is not installed")
+        self.kind = kind
+        self.dictionary = dictionary
+        self._local = threading.local()
+
+    def compress(self, body: str) -> bytes:
+        data = body.encode('utf-8')
+        if self.kind == CODEC_ZSTD:
+            return self._zstd().compress(data)
+        if self.kind == CODEC_ZLIB:
+            compressor = zlib.compressobj(9, zlib.DEFLATED, -15, zdict=self.dictionary)
+            return compressor.compress(data) + compressor.flush()
+        return data
+
+    def decompress(self, blob: bytes) -> str:
+        if self.kind == CODEC_ZSTD:
+            data = self._zstd_decompressor().decompress(blob)
+        elif self.kind == CODEC_ZLIB:
+            decompressor = zlib.decompressobj(-15, zdict=self.dictionary)
+            data = decompressor.decompress(blob) + decompressor.flush()
+        else:
+            data = blob
+        return data.decode('utf-8', errors='ignore')
+
+    def _zstd(self):
+        # zstandard contexts are not safe to share between threads
+        compressor = getattr(self._local, 'compressor', None)
+        if compressor is None:
+            compressor = self._local.compressor = zstandard.ZstdCompressor(
+                level=9, dict_data=zstandard.ZstdCompressionDict(self.dictionary))
+        return compressor
+
+    def _zstd_decompressor(self):
+        decompressor = getattr(self._local, 'decompressor', None)
+        if decompressor is None:
+            decompressor = self._local.decompressor = zstandard.ZstdDecompressor(
+                dict_data=zstandard.ZstdCompressionDict(self.dictionary))
+        return decompressor
+
+
+def train_codec(bodies: List[str], size: int = ZLIB_DICTIONARY_SIZE) -> BodyCodec:
+    """
+    Train a dictionary on the account's own mail: zstd when available, otherwise a zlib
+    preset dictionary built from lines repeated across messages (signatures, footers, templates)
+    """
+    samples = [body.encode('utf-8') for body in bodies if body]
+    if not samples:
+        return BodyCodec()
+
+    if zstandard is not None:
+        try:
+            trained = zstandard.train_dictionary(size, samples)
+            return BodyCodec(CODEC_ZSTD, trained.as_bytes())
+        except zstandard.ZstdError as e:
+            print(f"zstd dictionary training failed, using zlib: {e}")
+
+    line_counts = Counter()
+    for sample in samples:
+        line_counts.update(set(line.strip() for line in sample.splitlines() if len(line.strip()) > 8))
+
+    repeated = sorted(
+        (line for line, count in line_counts.items() if count > 1),
+        key=lambda line: line_counts[line] * len(line),
+        reverse=True
+    )
+    chosen, used = [], 0
+    for line in repeated:
+        if used + len(line) + 1 > size:
+            continue
+        chosen.append(line)
+        used += len(line) + 1
+
+    # zlib matches nearer the end of the dictionary more cheaply, so the most valuable lines go last
+    dictionary = b'\n'.join(reversed(chosen))
+    return BodyCodec(CODEC_ZLIB, dictionary) if dictionary else BodyCodec()
+
+
+class DictionaryStore:
+    def __init__(self, index_dir: str, retrain_bytes: int = 4 * 1024 * 1024):
+        """
+        Persist the trained dictionary next to the snapshots and retrain it once
+        retrain_bytes of mail newer than the training set have arrived, counted
+        across builds in the DICTIONARY state
+        """
+        self.index_dir = index_dir
+        self.retrain_bytes = retrain_bytes
+
+    def codec_for(self, emails: List) -> BodyCodec:
+        """
+        The codec to compress this build with, retraining when the size threshold is crossed
+        """
+        newest_uid = max((_uid_number(email) for email in emails), default=0)
+        state = self._load()
+        if state is not None:
+            pending = state.get('pending_bytes', 0) + sum(
+                len(email.get('body', '').encode('utf-8')) for email in emails
+                if _uid_number(email) > state['max_uid']
+            )
+            if pending < self.retrain_bytes:
+                self._save_state(state['file'], state['kind'], max(state['max_uid'], newest_uid), pending)
+                return BodyCodec(state['kind'], state['dictionary'])
+
+        codec = train_codec([email.get('body', '') for email in emails])
+        name = f"dict-{newest_uid}-{codec.kind}.bin"
+        with open(os.path.join(self.index_dir, name), 'wb') as handle:
+            handle.write(codec.dictionary)
+        self._save_state(name, codec.kind, newest_uid, 0)
+
+        # Each snapshot generation embeds its own copy, so older dictionary files are no longer needed
+        for other in os.listdir(self.index_dir):
+            if other.startswith('dict-') and other.endswith('.bin') and other != name:
+                try:
+                    os.remove(os.path.join(self.index_dir, other))
+                except OSError:
+                    pass
+        return codec
+
+    def _load(self) -> Optional[dict]:
+        try:
+            with open(os.path.join(self.index_dir, DICTIONARY_FILE)) as handle:
+                state = json.load(handle)
+            with open(os.path.join(self.index_dir, state['file']), 'rb') as handle:
+                state['dictionary'] = handle.read()
+        except (OSError, ValueError, KeyError):
+            return None
+        if state.get('kind') == CODEC_ZSTD and zstandard is None:
+            return None
+        return state
+
+    def _save_state(self, name: str, kind: int, max_uid: int, pending_bytes: int):
+        state_path = os.path.join(self.index_dir, DICTIONARY_FILE)
+        with open(state_path + '.tmp', 'w') as handle:
+            json.dump({'file': name, 'kind': kind, 'max_uid': max_uid, 'pending_bytes': pending_bytes}, handle)
+        os.replace(state_path + '.tmp', state_path)
+
+
+def _uid_number(email) -> int:
+    try:
+        return int(email.get('uid', 0))
+    except (TypeError, ValueError):
+        return 0
@@ -0,0 +1,225 @@
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+# Fixed English names: IMAP dates and most queries use them whatever the server locale
+MONTH_NAMES = ['january', 'february', 'march', 'april', 'may', 'june', 'july',
+               'august', 'september', 'october', 'november', 'december']
+MONTHS = {name: number for number, name in enumerate(MONTH_NAMES, 1)}
+MONTHS.update({name[:3]: number for number, name in enumerate(MONTH_NAMES, 1)})
+MONTH_PATTERN = '|'.join(sorted(MONTHS, key=len, reverse=True))
+ADDRESS = re.compile(r"\b[\w.+-]+@([\w-]+(?:\.[\w-]+)+)\b")
+AT_DOMAIN = re.compile(r"@([\w-]+(?:\.[\w-]+)+)\b")
+FROM_DOMAIN = re.compile(r"\bfrom\s+([\w-]+(?:\.[\w-]+)+)\b", re.IGNORECASE)
+# "from john.smith" or "from node.js" must not become sender filters, so a bare name needs a known TLD
+DOMAIN_TLDS = {
+    'com', 'org', 'net', 'edu', 'gov', 'mil', 'int', 'io', 'co', 'ai', 'app', 'dev', 'info', 'biz',
+    'email', 'cloud', 'tech', 'xyz', 'me', 'tv', 'us', 'uk', 'ca', 'au', 'nz', 'ie', 'de', 'fr', 'nl',
+    'be', 'at', 'ch', 'it', 'es', 'pt', 'se', 'no', 'dk', 'fi', 'pl', 'cz', 'eu', 'ru', 'in', 'jp',
+    'cn', 'kr', 'sg', 'hk', 'br', 'mx', 'ar', 'za',
+}
+MONTH_RANGE = re.compile(rf"\b(in|during|since|after|before)\s+({MONTH_PATTERN})\b\.?(?:\s+(\d{{4}}))?", re.IGNORECASE)
+YEAR = re.compile(r"\b(in|during|since|before)\s+(\d{4})\b", re.IGNORECASE)
+RELATIVE = re.compile(r"\b(?:last|past)\s+(\d+)\s+(day|week|month)s?\b", re.IGNORECASE)
+# Filters answered from message flags, which change after a snapshot is built
+FLAG_FILTERS = ('unread', 'flagged', 'answered')
+# Only words that cannot be read any other way; "new" or "read" are too common in queries
+FLAG_WORDS = {
+    'unread': ('unread', True), 'unseen': ('unread', True),
+    'starred': ('flagged', True), 'unflagged': ('flagged', False), 'unanswered': ('answered', False),
+}
+# Verbs that only name a flag in flag phrasing: "flagged emails", "emails I replied to".
+# "customers replied to the survey" or "flagged as urgent by legal" are about something else.
+FLAG_VERBS = {'flagged': ('flagged', True), 'replied': ('answered', True), 'answered': ('answered', True)}
+MAIL_NOUNS = {'email', 'emails', 'mail', 'mails', 'message', 'messages', 'thread', 'threads', 'ones'}
+FIRST_PERSON = {'i', 'we', "i've", "we've", 'ive', 'weve'}
+# Allowed between the user and the verb, as in "emails I have already answered"
+FIRST_PERSON_FILLERS = {'have', 'had', 'already', 'just', 'recently'}
+# Words that only name a flag after a negation: "haven't read", "didn't reply"
+NEGATED_FLAG_WORDS = {
+    'read': ('unread', True), 'seen': ('unread', True), 'opened': ('unread', True),
+    'reply': ('answered', False), 'respond': ('answered', False), 'responded': ('answered', False),
+}
+NEGATIONS = {
+    'not', 'never', 'no', "haven't", 'havent', "hasn't", 'hasnt', "didn't", 'didnt',
+    "don't", 'dont', "wasn't", 'wasnt', "weren't", 'werent', "isn't", 'isnt', "aren't", 'arent',
+}
+# Allowed between a negation and the flag word, as in "not yet replied" or "haven't I read"
+NEGATION_FILLERS = {'yet', 'been', 'ever', 'already', 'i', 'we'}
+
+
+def parse_filters(user_input: str, now: Optional[float] = None) -> Dict:
+    """
+    Pull sender, date-range and flag constraints out of a query, e.g.
+    "from @vendor.com in March, unread" -> {'domain': 'vendor.com', 'since': ..., 'before': ..., 'unread': True}
+    Dates are UTC epochs with 'since' inclusive and 'before' exclusive.
+    """
+    now_dt = datetime.fromtimestamp(time.time() if now is None else now, timezone.utc)
+    text = user_input or ''
+    filters = {}
+
+    address = ADDRESS.search(text)
+    if address:
+        filters['address'] = address.group(0).lower()
+    else:
+        domain = _sender_domain(text)
+        if domain:
+            filters['domain'] = domain
+
+    filters.update(_date_range(text, now_dt))
+    filters.update(_flags(text))
+    return filters
+
+
+def _sender_domain(text: str) -> Optional[str]:
+    match = AT_DOMAIN.search(text)
+    if match:
+        return match.group(1).lower()
+    for match in FROM_DOMAIN.finditer(text):
+        domain = match.group(1).lower()
+        if domain.rpartition('.')[2] in DOMAIN_TLDS:
+            return domain
+    return None
+
+
+def _flags(text: str) -> Dict:
+    words = re.findall(r"[a-z']+", text.lower().replace('\u2019', "'"))
+    flags = {}
+    for index, word in enumerate(words):
+        if word not in FLAG_WORDS and word not in FLAG_VERBS and word not in NEGATED_FLAG_WORDS:
+            continue
+        previous = index - 1
+        while previous >= 0 and words[previous] in NEGATION_FILLERS:
+            previous -= 1
+        negated = previous >= 0 and words[previous] in NEGATIONS
+
+        if word in FLAG_WORDS:
+            name, value = FLAG_WORDS[word]
+            flags[name] = value != negated
+        elif word in FLAG_VERBS:
+            if negated or _flag_phrasing(words, index):
+                name, value = FLAG_VERBS[word]
+                flags[name] = value != negated
+        elif negated:
+            name, value = NEGATED_FLAG_WORDS[word]
+            flags[name] = value
+    return flags
+
+
+def _flag_phrasing(words: List[str], index: int) -> bool:
+    if index + 1 < len(words) and words[index + 1] in MAIL_NOUNS:
+        return True
+    previous = index - 1
+    while previous >= 0 and words[previous] in FIRST_PERSON_FILLERS:
+        previous -= 1
+    return previous >= 0 and words[previous] in FIRST_PERSON
+
+
+def _date_range(text: str, now: datetime) -> Dict:
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    lowered = text.lower()
+
+    match = MONTH_RANGE.search(text)
+    if match:
+        month = MONTHS[match.group(2).lower()]
+        if match.group(3):
+            year = int(match.group(3))
+        else:
+            # A bare month means its most recent occurrence
+            year = now.year if month <= now.month else now.year - 1
+        start = datetime(year, month, 1, tzinfo=timezone.utc)
+        end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+        return _range_for(match.group(1).lower(), start, end)
+
+    match = YEAR.search(text)
+    if match:
+        start = datetime(int(match.group(2)), 1, 1, tzinfo=timezone.utc)
+        return _range_for(match.group(1).lower(), start, start.replace(year=start.year + 1))
+
+    match = RELATIVE.search(text)
+    if match:
+        days = int(match.group(1)) * {'day': 1, 'week': 7, 'month': 30}[match.group(2).lower()]
+        return {'since': int((now - timedelta(days=days)).timestamp())}
+
+    if 'yesterday' in lowered:
+        return {'since': int((today - timedelta(days=1)).timestamp()), 'before': int(today.timestamp())}
+    if 'today' in lowered:
+        return {'since': int(today.timestamp())}
+    if re.search(r"\b(last|past) week\b", lowered):
+        return {'since': int((today - timedelta(days=7)).timestamp())}
+    if 'this week' in lowered:
+        return {'since': int((today - timedelta(days=today.weekday())).timestamp())}
+    if 'this month' in lowered:
+        return {'since': int(today.replace(day=1).timestamp())}
+    if 'last month' in lowered:
+        end = today.replace(day=1)
+        return {'since': int((end - timedelta(days=1)).replace(day=1).timestamp()), 'before': int(end.timestamp())}
+    if 'this year' in lowered:
+        return {'since': int(today.replace(month=1, day=1).timestamp())}
+    return {}
+
+
+def _range_for(keyword: str, start: datetime, end: datetime) -> Dict:
+    if keyword in ('since', 'after'):
+        return {'since': int((start if keyword == 'since' else end).timestamp())}
+    if keyword == 'before':
+        return {'before': int(start.timestamp())}
+    return {'since': int(start.timestamp()), 'before': int(end.timestamp())}
+
+
+def matches(email: Dict, filters: Dict) -> bool:
+    """
+    Check one parsed email against the filters exactly
+    """
+    if 'address' in filters and email.get('sender_address') != filters['address']:
+        return False
+    if 'domain' in filters and not _in_domain(email.get('sender_domain', ''), filters['domain']):
+        return False
+    date = email.get('date')
+    if ('since' in filters or 'before' in filters) and date is None:
+        return False
+    if 'since' in filters and date < filters['since']:
+        return False
+    if 'before' in filters and date >= filters['before']:
+        return False
+
+    flags = email.get('flags', [])
+    if 'unread' in filters and ('seen' not in flags) != filters['unread']:
+        return False
+    for name in ('flagged', 'answered'):
+        if name in filters and (name in flags) != filters[name]:
+            return False
+    return True
+
+
+def _in_domain(domain: str, wanted: str) -> bool:
+    return domain == wanted or domain.endswith('.' + wanted)
+
+
+def imap_criteria(filters: Dict) -> List[str]:
+    """
+    Translate filters into IMAP SEARCH keys so the server narrows the UID list.
+    SENTSINCE/SENTBEFORE compare the Date header's own calendar day, not UTC, so each
+    bound is widened by a day; results are re-checked locally with matches().
+    """
+    criteria = []
+    if 'address' in filters or 'domain' in filters:
+        criteria += ['FROM', f'"{filters.get("address") or filters["domain"]}"']
+    if 'since' in filters:
+        criteria += ['SENTSINCE', _imap_date(filters['since'] - 86400)]
+    if 'before' in filters:
+        # SENTBEFORE is exclusive, so the day holding the last instant before 'before' must stay in
+        criteria += ['SENTBEFORE', _imap_date(filters['before'] - 1 + 2 * 86400)]
+    if 'unread' in filters:
+        criteria.append('UNSEEN' if filters['unread'] else 'SEEN')
+    if 'flagged' in filters:
+        criteria.append('FLAGGED' if filters['flagged'] else 'UNFLAGGED')
+    if 'answered' in filters:
+        criteria.append('ANSWERED' if filters['answered'] else 'UNANSWERED')
+    return criteria or ['ALL']
+
+
+def _imap_date(epoch: int) -> str:
+    day = time.gmtime(epoch)
+    return f"{day.tm_mday:02d}-{MONTH_NAMES[day.tm_mon - 1][:3].title()}-{day.tm_year}"
@@ -0,0 +1,171 @@
+import json
+import re
+import urllib.error
+import urllib.request
+from abc import ABC, abstractmethod
+from typing import Dict, List, NamedTuple, Optional
+
+from django.conf import settings
+
+
+# Phrases providers use when the prompt plus max_tokens does not fit the model
+CONTEXT_OVERFLOW = re.compile(
+    r"context[_ ]length|context window|maximum context|reduce the length|too many tokens",
+    re.IGNORECASE
+)
+
+
+class ContextOverflow(Exception):
+    """
+    Raised by a backend when the request does not fit the model's context window
+    """
+
+
+class ModelTier(NamedTuple):
+    name: str
+    model: str
+    context_window: int
+
+
+class LLMBackend(ABC):
+    @abstractmethod
+    def complete(self, messages: List[Dict[str, str]], model: str, max_tokens: int, temperature: float) -> str:
+        """
+        Send a chat completion request and return the reply text
+        """
+
+
+class GroqBackend(LLMBackend):
+    def __init__(self, client):
+        """
+        Backend for the Groq SDK client
+        """
+        self.client = client
+
+    def complete(self, messages: List[Dict[str, str]], model: str, max_tokens: int, temperature: float) -> str:
+        try:
+            response = self.client.chat.completions.create(
+                messages=messages,
+                model=model,
+                max_tokens=max_tokens,
+                temperature=temperature
+            )
+        except Exception as e:
+            # The SDK's errors carry the response body, including the error code
+            if CONTEXT_OVERFLOW.search(str(e)):
+                raise ContextOverflow(str(e)) from e
+            raise
+        return response.choices[0].message.content
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    def __init__(self, base_url: str, api_key: str = "", timeout: float = 60):
+        """
+        Backend for any server exposing the OpenAI /chat/completions API
+        """
+        self.url = base_url.rstrip('/') + '/chat/completions'
+        self.api_key = api_key
+        self.timeout = timeout
+
+    def complete(self, messages: List[Dict[str, str]], model: str, max_tokens: int, temperature: float) -> str:
+        headers = {'Content-Type': 'application/json'}
+        if self.api_key:
+            headers['Authorization'] = f"Bearer {self.api_key}"
+
+        body = json.dumps({
+            'model': model,
+            'messages': messages,
+            'max_tokens': max_tokens,
+            'temperature': temperature
+        }).encode('utf-8')
+        request = urllib.request.Request(self.url, data=body, headers=headers, method='POST')
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                payload = json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            # str(HTTPError) is only the status line; the reason is in the body
+            detail = e.read().decode('utf-8', errors='replace')
+            if CONTEXT_OVERFLOW.search(detail):
+                raise ContextOverflow(detail) from e
+            raise RuntimeError(f"HTTP Error {e.code} from {self.url}: {detail}") from e
+        return payload['choices'][0]['message']['content']
+
+
+class ModelRouter:
+    COMPLEX_CUES = re.compile(
+        r"\b(and|or|but|except|unless|between|compare|summari[sz]e|all|every|before|after|since|"
+        r"last|past|week|month|year|not|without|which|why|how)\b",
+        re.IGNORECASE
+    )
+
+    def __init__(self, backend: LLMBackend, tiers: List[ModelTier], complexity_threshold: int = 4):
+        """
+        Route each call to the cheapest tier that fits the prompt and the query's complexity.
+        Tiers are ordered from fastest to largest.
+        """
+        self.backend = backend
+        self.tiers = tiers
+        self.complexity_threshold = complexity_threshold
+
+    def estimate_tokens(self, messages: List[Dict[str, str]]) -> int:
+        """
+        Rough token count: about four characters per token plus per-message overhead
+        """
+        return sum(len(message['content']) // 4 + 4 for message in messages)
+
+    def complexity(self, query: str) -> int:
+        """
+        Count signals that a query needs more reasoning than the fast tier gives
+        """
+        words = query.split()
+        return len(self.COMPLEX_CUES.findall(query)) + len(words) // 15
+
+    def select(self, messages: List[Dict[str, str]], max_tokens: int, query: str = "") -> ModelTier:
+        """
+        Pick the first tier whose context fits the prompt, skipping the fast tier for complex queries
+        """
+        needed = self.estimate_tokens(messages) + max_tokens
+        candidates = self.tiers
+        if len(candidates) > 1 and self.complexity(query) >= self.complexity_threshold:
+            candidates = candidates[1:]
+
+        for tier in candidates:
+            if needed <= tier.context_window:
+                return tier
+        return max(self.tiers, key=lambda tier: tier.context_window)
+
+    def complete(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float = 0,
+                 query: str = "") -> str:
+        """
+        Run a completion on the selected tier, retrying on a larger one if the context overflows
+        """
+        tier = self.select(messages, max_tokens, query)
+        try:
+            return self.backend.complete(messages, tier.model, max_tokens, temperature)
+        except ContextOverflow:
+            larger = self._larger_tier(tier)
+            if larger is None:
+                raise
+            print(f"Context overflow on {tier.model}, retrying with {larger.model}")
+            return self.backend.complete(messages, larger.model, max_tokens, temperature)
+
+    def _larger_tier(self, tier: ModelTier) -> Optional[ModelTier]:
+        larger = [other for other in self.tiers if other.context_window > tier.context_window]
+        return min(larger, key=lambda other: other.context_window) if larger else None
+
+
+def build_router(groq_client) -> ModelRouter:
+    """
+    Build the router from the EMAIL_CHATBOT_LLM setting, defaulting to Groq
+    """
+    config = getattr(settings, 'EMAIL_CHATBOT_LLM', {})
+    if config.get('BASE_URL'):
+        backend = OpenAICompatibleBackend(config['BASE_URL'], config.get('API_KEY', ''))
+    else:
+        backend = GroqBackend(groq_client)
+
+    tiers = [
+        ModelTier('fast', config.get('FAST_MODEL', 'llama3-8b-8192'), int(config.get('FAST_CONTEXT', 8192))),
+        ModelTier('large', config.get('LARGE_MODEL', 'llama-3.3-70b-versatile'), int(config.get('LARGE_CONTEXT', 131072)))
+    ]
+    return ModelRouter(backend, tiers, int(config.get('COMPLEXITY_THRESHOLD', 4)))
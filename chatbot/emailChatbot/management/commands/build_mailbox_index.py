@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+import os
+
+from emailChatbot.classifier import CLASSIFIER_FILE, BulkMailClassifier
+from emailChatbot.snapshot import SnapshotWriter
+from emailChatbot.views import IntelligentEmailChatbot
+
+
+class Command(BaseCommand):
+    help = "Fetch the mailbox and publish a new memory-mapped snapshot generation for the workers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=500, help="Number of newest emails to index")
+
+    def handle(self, *args, **options):
+        index_dir = getattr(settings, 'EMAIL_CHATBOT_INDEX_DIR', '')
+        if not index_dir:
+            raise CommandError("EMAIL_CHATBOT_INDEX_DIR is not set")
+
+        # A fresh classifier learns from the whole fetched mailbox before labelling it
+        chatbot = IntelligentEmailChatbot()
+        chatbot.classifier = BulkMailClassifier()
+        emails = chatbot.get_emails(limit=options['limit'], use_snapshot=False)
+        if not emails:
+            raise CommandError("No emails retrieved, keeping the current snapshot")
+
+        path = SnapshotWriter(index_dir).write(emails)
+        chatbot.classifier.save(os.path.join(index_dir, CLASSIFIER_FILE))
+        self.stdout.write(self.style.SUCCESS(f"Indexed {len(emails)} emails into {path}"))
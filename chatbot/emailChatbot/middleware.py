@@ -0,0 +1,151 @@
+import cProfile
+import functools
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+from typing import Dict, List
+
+from django.conf import settings
+
+PROFILE_HEADER = 'X-Profile'
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+_active = threading.local()
+# tracemalloc is process-wide, so only one request is profiled at a time
+_profile_lock = threading.Lock()
+
+
+def profiled(function):
+    """
+    Wrap a callable about to be submitted to a worker thread so it is profiled as part of the
+    current request; returns it unchanged when the request is not being profiled
+    """
+    worker_profiles = getattr(_active, 'worker_profiles', None)
+    if worker_profiles is None:
+        return function
+
+    @functools.wraps(function)
+    def run(*args, **kwargs):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ allows one profiler per process, and it already sees every thread
+            return function(*args, **kwargs)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profiler.disable()
+            worker_profiles.append(profiler)
+    return run
+
+
+def allocation_checkpoint(label: str):
+    """
+    Record an allocation snapshot if the current request is being profiled; a no-op otherwise
+    """
+    checkpoints = getattr(_active, 'checkpoints', None)
+    if checkpoints is not None:
+        checkpoints.append((label, tracemalloc.take_snapshot()))
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        """
+        Profile single requests on demand: staff users send "X-Profile: 1" and get an
+        X-Profile-Id back. Requests without the header only pay for one lookup.
+        """
+        self.get_response = get_response
+        self.profile_dir = getattr(settings, 'EMAIL_CHATBOT_PROFILE_DIR', '')
+
+    def __call__(self, request):
+        if not self.profile_dir or request.headers.get(PROFILE_HEADER) != '1':
+            return self.get_response(request)
+
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_staff:
+            return self.get_response(request)
+
+        if not _profile_lock.acquire(blocking=False):
+            response = self.get_response(request)
+            response['X-Profile-Skipped'] = 'another profile is running'
+            return response
+        try:
+            return self._profile(request)
+        finally:
+            _profile_lock.release()
+
+    def _profile(self, request):
+        profile_id = uuid.uuid4().hex
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(25)
+        tracemalloc.reset_peak()
+        _active.checkpoints = []
+        _active.worker_profiles = []
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - started
+            checkpoints = _active.checkpoints + [('end of request', tracemalloc.take_snapshot())]
+            peak = tracemalloc.get_traced_memory()[1]
+            worker_profiles = _active.worker_profiles
+            _active.checkpoints = None
+            _active.worker_profiles = None
+            if started_tracing:
+                tracemalloc.stop()
+
+        try:
+            self._save(profile_id, request, profiler, worker_profiles, checkpoints, peak, elapsed)
+            response['X-Profile-Id'] = profile_id
+        except OSError as e:
+            print(f"Profile save error: {e}")
+        return response
+
+    def _save(self, profile_id: str, request, profiler: cProfile.Profile, worker_profiles: List[cProfile.Profile],
+              checkpoints: List, peak: int, elapsed: float):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        report = io.StringIO()
+        # Tasks run in worker threads (intent analysis, batch ranking) are merged into the request's profile
+        stats = pstats.Stats(profiler, stream=report)
+        for worker_profile in worker_profiles:
+            stats.add(worker_profile)
+        stats.dump_stats(os.path.join(self.profile_dir, f"{profile_id}.prof"))
+
+        report.write(f"{request.method} {request.get_full_path()} took {elapsed:.3f}s, "
+                     f"peak traced memory {peak / 1024:.1f} KiB, {len(worker_profiles)} worker-thread tasks profiled\n\n")
+        stats.sort_stats('cumulative').print_stats(40)
+
+        for label, allocations in checkpoints:
+            report.write(f"\nLive allocations at {label}, by application line (including library calls made from it):\n")
+            for location, (size, count) in app_allocations(allocations)[:15]:
+                report.write(f"{size / 1024:10.1f} KiB {count:8d} blocks  {location}\n")
+
+        with open(os.path.join(self.profile_dir, f"{profile_id}.txt"), 'w') as handle:
+            handle.write(report.getvalue())
+
+
+def app_allocations(snapshot: tracemalloc.Snapshot) -> List:
+    """
+    Attribute live allocations to the innermost frame inside this app, so MIME parsing in the
+    email package is charged to the line in views.py that called it
+    """
+    totals: Dict[str, List[int]] = {}
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(True, os.path.join(APP_DIR, '*'), all_frames=True)])
+    for stat in snapshot.statistics('traceback'):
+        for frame in reversed(stat.traceback):
+            if frame.filename.startswith(APP_DIR) and not frame.filename.endswith('middleware.py'):
+                location = f"{os.path.relpath(frame.filename, APP_DIR)}:{frame.lineno}"
+                total = totals.setdefault(location, [0, 0])
+                total[0] += stat.size
+                total[1] += stat.count
+                break
+    return sorted(totals.items(), key=lambda item: item[1][0], reverse=True)
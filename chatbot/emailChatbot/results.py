@@ -0,0 +1,69 @@
+import base64
+import binascii
+import json
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from django.core.cache import caches
+
+
+class ResultStore:
+    def __init__(self, timeout: int = 900):
+        """
+        Keep ranked result sets in the shared 'results' cache so later pages are a lookup,
+        not an LLM call, whichever worker serves them
+        """
+        self.timeout = timeout
+        self.cache = caches['results']
+
+    def save(self, query: str, matches: List[Dict]) -> str:
+        """
+        Store a result set ordered by relevance and return its id
+        """
+        result_id = uuid.uuid4().hex
+        ranked = sorted(matches, key=lambda match: match.get('score', 0), reverse=True)
+        self.cache.set(self._key(result_id), {'query': query, 'matches': ranked}, self.timeout)
+        return result_id
+
+    def page(self, result_id: str, offset: int, size: int) -> Optional[Dict]:
+        """
+        Return one page of a stored result set, or None once it has expired
+        """
+        entry = self.cache.get(self._key(result_id))
+        if entry is None:
+            return None
+
+        matches = entry['matches']
+        next_offset = offset + size
+        return {
+            'query': entry['query'],
+            'total': len(matches),
+            'results': matches[offset:next_offset],
+            'next_cursor': encode_cursor(result_id, next_offset) if next_offset < len(matches) else None
+        }
+
+    def _key(self, result_id: str) -> str:
+        return f"emailChatbot:results:{result_id}"
+
+
+def encode_cursor(result_id: str, offset: int) -> str:
+    """
+    Pack a result id and offset into an opaque cursor string
+    """
+    payload = json.dumps({'rid': result_id, 'off': offset}).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[str, int]]:
+    """
+    Unpack a cursor produced by encode_cursor, or None if it is malformed
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        result_id, offset = str(payload['rid']), int(payload['off'])
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        return None
+
+    if offset < 0:
+        return None
+    return result_id, offset
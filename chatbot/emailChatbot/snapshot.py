@@ -0,0 +1,375 @@
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+from array import array
+from collections.abc import Mapping
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+
+from .compression import BodyCodec, DictionaryStore
+
+MAGIC = b'EMIX'
+VERSION = 3
+VECTOR_DIMS = 256
+# magic, version, records, terms, dims, body codec, then offsets of the record, term,
+# posting, vector, compressed body, dictionary and date sections
+HEADER = struct.Struct('<4sIIIII7Q')
+OFFSET = struct.Struct('<Q')
+TOKEN_PATTERN = re.compile(r"\w{2,}")
+CURRENT_FILE = 'CURRENT'
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower-case word tokens used for both the term index and the hashed vectors
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def index_keys(email) -> List[str]:
+    """
+    Secondary index keys for sender address, sender domain (and parent domains) and flags.
+    The ':' keeps them apart from word tokens in the shared term table.
+    """
+    keys = []
+    if email.get('sender_address'):
+        keys.append(f"address:{email['sender_address']}")
+    labels = (email.get('sender_domain') or '').split('.')
+    keys.extend(f"domain:{'.'.join(labels[i:])}" for i in range(len(labels) - 1) if labels[0])
+    keys.extend(f"flag:{flag}" for flag in email.get('flags', []))
+    return keys
+
+
+def hashed_vector(tokens: Iterable[str]) -> array:
+    """
+    L2-normalised bag-of-words vector with tokens hashed into VECTOR_DIMS buckets
+    """
+    vector = array('f', bytes(4 * VECTOR_DIMS))
+    for token in tokens:
+        vector[zlib.crc32(token.encode('utf-8')) % VECTOR_DIMS] += 1.0
+    norm = math.sqrt(sum(value * value for value in vector))
+    if norm:
+        for i in range(VECTOR_DIMS):
+            vector[i] /= norm
+    return vector
+
+
+class SnapshotWriter:
+    def __init__(self, index_dir: str, keep: int = 2, retrain_bytes: int = 4 * 1024 * 1024):
+        """
+        Build read-only snapshot generations and publish them with an atomic swap
+        """
+        self.index_dir = index_dir
+        self.keep = keep
+        self.dictionaries = DictionaryStore(index_dir, retrain_bytes)
+
+    def write(self, emails: List[Dict[str, str]]) -> str:
+        """
+        Write a new generation for emails (newest first) and make it current
+        """
+        os.makedirs(self.index_dir, exist_ok=True)
+        generation = self._next_generation()
+        name = f"gen-{generation:08d}.idx"
+        path = os.path.join(self.index_dir, name)
+
+        with open(path + '.tmp', 'wb') as handle:
+            handle.write(self._build(emails, self.dictionaries.codec_for(emails)))
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(path + '.tmp', path)
+
+        current = os.path.join(self.index_dir, CURRENT_FILE)
+        with open(current + '.tmp', 'w') as handle:
+            handle.write(name)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(current + '.tmp', current)
+
+        self._prune(generation)
+        return path
+
+    def _build(self, emails: List[Dict[str, str]], codec: BodyCodec) -> bytes:
+        # Bodies live in their own section, compressed per record so each stays random-access
+        records = [
+            json.dumps({key: value for key, value in email.items() if key != 'body'}, ensure_ascii=False).encode('utf-8')
+            for email in emails
+        ]
+        bodies = [codec.compress(email.get('body', '')) for email in emails]
+        postings: Dict[str, List[int]] = {}
+        vectors = array('f')
+        dates = []
+        for position, email in enumerate(emails):
+            tokens = tokenize(' '.join([email.get('subject', ''), email.get('sender', ''), email.get('body', '')]))
+            for token in set(tokens) | set(index_keys(email)):
+                postings.setdefault(token, []).append(position)
+            vectors.extend(hashed_vector(tokens))
+            if email.get('date') is not None:
+                dates.append((int(email['date']), position))
+
+        terms = sorted(postings)
+        term_bytes = [term.encode('utf-8') for term in terms]
+
+        sections = []
+        sections.append(self._offset_table(records) + b''.join(records))
+        sections.append(self._offset_table(term_bytes) + b''.join(term_bytes))
+        posting_blobs = [array('I', postings[term]).tobytes() for term in terms]
+        sections.append(self._offset_table(posting_blobs) + b''.join(posting_blobs))
+        sections.append(vectors.tobytes())
+        sections.append(self._offset_table(bodies) + b''.join(bodies))
+        sections.append(self._offset_table([codec.dictionary]) + codec.dictionary)
+        # (epoch, position) pairs sorted by date for range lookups
+        sections.append(array('q', [value for pair in sorted(dates) for value in pair]).tobytes())
+
+        offsets = []
+        position = HEADER.size
+        for section in sections:
+            padding = -position % 8
+            offsets.append(position + padding)
+            position += padding + len(section)
+
+        out = bytearray(HEADER.pack(MAGIC, VERSION, len(records), len(terms), VECTOR_DIMS, codec.kind, *offsets))
+        for offset, section in zip(offsets, sections):
+            out.extend(bytes(offset - len(out)))
+            out.extend(section)
+        return bytes(out)
+
+    def _offset_table(self, blobs: List[bytes]) -> bytes:
+        table = bytearray(OFFSET.pack(0))
+        total = 0
+        for blob in blobs:
+            total += len(blob)
+            table.extend(OFFSET.pack(total))
+        return bytes(table)
+
+    def _generations(self) -> List[int]:
+        found = []
+        for name in os.listdir(self.index_dir):
+            match = re.fullmatch(r"gen-(\d+)\.idx", name)
+            if match:
+                found.append(int(match.group(1)))
+        return sorted(found)
+
+    def _next_generation(self) -> int:
+        generations = self._generations()
+        return generations[-1] + 1 if generations else 1
+
+    def _prune(self, current: int):
+        # Workers still mapping an older generation keep it alive until they swap
+        for generation in self._generations():
+            if generation <= current - self.keep:
+                try:
+                    os.remove(os.path.join(self.index_dir, f"gen-{generation:08d}.idx"))
+                except OSError:
+                    pass
+
+
+class MailboxSnapshot:
+    def __init__(self, path: str):
+        """
+        Memory-map one snapshot generation; sections are read lazily straight from the map
+        """
+        with open(path, 'rb') as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        self.path = path
+
+        magic, version, self.record_count, self.term_count, self.dims, codec_kind, *offsets = \
+            HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a mailbox snapshot: {path}")
+        self._records_at, self._terms_at, self._postings_at, self._vectors_at, self._bodies_at, dictionary_at, \
+            self._dates_at = offsets
+        self.codec = BodyCodec(codec_kind, self._blob(dictionary_at, 1, 0))
+        self.dated_count = (len(self._map) - self._dates_at) // 16
+
+    def __len__(self) -> int:
+        return self.record_count
+
+    def record(self, position: int) -> 'StoredEmail':
+        """
+        Decode one stored email; its body is decompressed only when first read
+        """
+        return StoredEmail(json.loads(self._blob(self._records_at, self.record_count, position)), self, position)
+
+    def body(self, position: int) -> str:
+        return self.codec.decompress(self._blob(self._bodies_at, self.record_count, position))
+
+    def records(self, limit: Optional[int] = None, start: int = 0) -> List['StoredEmail']:
+        """
+        Stored emails, newest first
+        """
+        end = self.record_count if limit is None else min(start + limit, self.record_count)
+        return [self.record(position) for position in range(start, end)]
+
+    def postings(self, term: str) -> List[int]:
+        """
+        Binary-search the sorted term table and return the positions containing term
+        """
+        target = term.encode('utf-8')
+        low, high = 0, self.term_count
+        while low < high:
+            middle = (low + high) // 2
+            candidate = self._blob(self._terms_at, self.term_count, middle)
+            if candidate < target:
+                low = middle + 1
+            elif candidate > target:
+                high = middle
+            else:
+                return array('I', self._blob(self._postings_at, self.term_count, middle)).tolist()
+        return []
+
+    def lookup(self, filters: Dict) -> List[int]:
+        """
+        Positions (newest first) matching sender, date-range and flag filters, answered
+        from the secondary indexes without decoding any record
+        """
+        included, excluded = [], []
+        if 'address' in filters:
+            included.append(set(self.postings(f"address:{filters['address']}")))
+        if 'domain' in filters:
+            included.append(set(self.postings(f"domain:{filters['domain']}")))
+        if 'since' in filters or 'before' in filters:
+            included.append(self.dated_between(filters.get('since'), filters.get('before')))
+
+        for name, flag, present in (('unread', 'seen', False), ('flagged', 'flagged', True),
+                                    ('answered', 'answered', True)):
+            if name in filters:
+                flagged = set(self.postings(f"flag:{flag}"))
+                (included if filters[name] == present else excluded).append(flagged)
+
+        selected = set.intersection(*included) if included else set(range(self.record_count))
+        for flagged in excluded:
+            selected -= flagged
+        return sorted(selected)
+
+    def dated_between(self, since: Optional[int], before: Optional[int]) -> set:
+        """
+        Positions whose date falls in [since, before), found by binary search over the date section
+        """
+        dates = memoryview(self._map)[self._dates_at:self._dates_at + self.dated_count * 16].cast('q')
+        try:
+            start = self._first_date_at_least(dates, since) if since is not None else 0
+            end = self._first_date_at_least(dates, before) if before is not None else self.dated_count
+            return {dates[2 * i + 1] for i in range(start, end)}
+        finally:
+            dates.release()
+
+    def _first_date_at_least(self, dates: memoryview, epoch: int) -> int:
+        low, high = 0, self.dated_count
+        while low < high:
+            middle = (low + high) // 2
+            if dates[2 * middle] < epoch:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def vector(self, position: int) -> memoryview:
+        start = self._vectors_at + position * self.dims * 4
+        return memoryview(self._map)[start:start + self.dims * 4].cast('f')
+
+    def search(self, query: str, limit: int = 10) -> List['StoredEmail']:
+        """
+        Emails sharing at least one term with the query, ranked by hashed-vector cosine similarity
+        """
+        tokens = tokenize(query)
+        candidates = set()
+        for token in set(tokens):
+            candidates.update(self.postings(token))
+        if not candidates:
+            return []
+
+        query_vector = hashed_vector(tokens)
+        scored = []
+        for position in candidates:
+            stored = self.vector(position)
+            scored.append((sum(a * b for a, b in zip(query_vector, stored)), -position))
+            stored.release()
+        scored.sort(reverse=True)
+        return [self.record(-negative) for _, negative in scored[:limit]]
+
+    def _blob(self, section_at: int, count: int, position: int) -> bytes:
+        start, = OFFSET.unpack_from(self._map, section_at + position * OFFSET.size)
+        end, = OFFSET.unpack_from(self._map, section_at + (position + 1) * OFFSET.size)
+        data_at = section_at + (count + 1) * OFFSET.size
+        return self._map[data_at + start:data_at + end]
+
+
+class StoredEmail(Mapping):
+    def __init__(self, fields: Dict[str, str], snapshot: MailboxSnapshot, position: int):
+        """
+        Read-only email record that fetches its compressed body from the snapshot on demand
+        """
+        self._fields = fields
+        self._snapshot = snapshot
+        self._position = position
+
+    def __getitem__(self, key: str) -> str:
+        if key == 'body' and 'body' not in self._fields:
+            self._fields['body'] = self._snapshot.body(self._position)
+        return self._fields[key]
+
+    def __iter__(self):
+        yield from self._fields
+        if 'body' not in self._fields:
+            yield 'body'
+
+    def __len__(self) -> int:
+        return len(self._fields) + ('body' not in self._fields)
+
+
+class SnapshotReader:
+    def __init__(self, index_dir: str):
+        """
+        Per-process handle that follows the CURRENT pointer to the newest generation
+        """
+        self.index_dir = index_dir
+        self._lock = threading.Lock()
+        self._name = None
+        self._snapshot = None
+
+    def current(self) -> Optional[MailboxSnapshot]:
+        """
+        The current generation, re-opened only when the writer has swapped in a new one
+        """
+        try:
+            with open(os.path.join(self.index_dir, CURRENT_FILE)) as handle:
+                name = handle.read().strip()
+        except OSError:
+            return None
+
+        if name == self._name:
+            return self._snapshot
+
+        with self._lock:
+            if name != self._name:
+                try:
+                    self._snapshot = MailboxSnapshot(os.path.join(self.index_dir, name))
+                    self._name = name
+                except (OSError, ValueError) as e:
+                    print(f"Snapshot open error: {e}")
+            return self._snapshot
+
+
+_readers: Dict[str, SnapshotReader] = {}
+_readers_lock = threading.Lock()
+
+
+def get_snapshot() -> Optional[MailboxSnapshot]:
+    """
+    Current snapshot for EMAIL_CHATBOT_INDEX_DIR, shared by every request in this worker
+    """
+    index_dir = getattr(settings, 'EMAIL_CHATBOT_INDEX_DIR', '')
+    if not index_dir:
+        return None
+
+    with _readers_lock:
+        reader = _readers.get(index_dir)
+        if reader is None:
+            reader = _readers[index_dir] = SnapshotReader(index_dir)
+    return reader.current()
@@ -0,0 +1,140 @@
+import re
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from ..views import IntelligentEmailChatbot
+
+FLAG_KEYS = {
+    'SEEN': ('\\Seen', True), 'UNSEEN': ('\\Seen', False),
+    'FLAGGED': ('\\Flagged', True), 'UNFLAGGED': ('\\Flagged', False),
+    'ANSWERED': ('\\Answered', True), 'UNANSWERED': ('\\Answered', False),
+}
+
+
+def epoch(year, month, day):
+    return int(datetime(year, month, day, tzinfo=timezone.utc).timestamp())
+
+
+def make_email(uid, sender_address, subject, body, date=None, flags=(), bulk_signal=''):
+    """
+    A parsed email as _parse_message returns it
+    """
+    return {
+        'uid': str(uid),
+        'subject': subject,
+        'sender': f"Sender {uid} <{sender_address}>",
+        'sender_address': sender_address,
+        'sender_domain': sender_address.rpartition('@')[2],
+        'date': date,
+        'flags': list(flags),
+        'body': body,
+        'bulk_signal': bulk_signal,
+    }
+
+
+def raw_message(sender_address, subject, body, date, headers=''):
+    sent = format_datetime(datetime.fromtimestamp(date, timezone.utc))
+    return (f"From: Someone <{sender_address}>\r\nSubject: {subject}\r\nDate: {sent}\r\n{headers}\r\n{body}").encode()
+
+
+class FakeIMAP:
+    def __init__(self, messages):
+        """
+        Just enough of imaplib.IMAP4 for the chatbot: messages maps UID -> (raw bytes, IMAP flags).
+        Every uid() call is recorded in self.calls.
+        """
+        self.messages = messages
+        self.calls = []
+        self.closed = False
+
+    def select(self, mailbox):
+        pass
+
+    def uid(self, command, *args):
+        self.calls.append((command,) + args)
+        if command == 'search':
+            found = [uid for uid in sorted(self.messages) if self._matches(uid, list(args[1:]))]
+            return 'OK', [' '.join(map(str, found)).encode()]
+
+        response = []
+        for uid in args[0].split(b','):
+            raw, flags = self.messages[int(uid)]
+            response.append((f"1 (UID {int(uid)} FLAGS ({' '.join(flags)}) BODY[] {{{len(raw)}}}".encode(), raw))
+        return 'OK', response + [b')']
+
+    def searches(self):
+        return [call[2:] for call in self.calls if call[0] == 'search']
+
+    def close(self):
+        self.closed = True
+
+    def logout(self):
+        pass
+
+    def _matches(self, uid, criteria):
+        raw, flags = self.messages[uid]
+        headers = raw.split(b'\r\n\r\n')[0].decode()
+        while criteria:
+            key = criteria.pop(0)
+            if key == 'UID':
+                low, high = criteria.pop(0).split(':')
+                # As on a real server, "n:*" means n to the newest UID in either order,
+                # so it always includes the newest message
+                low = int(low)
+                high = max(self.messages) if high == '*' else int(high)
+                if not min(low, high) <= uid <= max(low, high):
+                    return False
+            elif key == 'FROM':
+                sender = re.search(r"^From: (.*)$", headers, re.MULTILINE).group(1)
+                if criteria.pop(0).strip('"').lower() not in sender.lower():
+                    return False
+            elif key in ('SENTSINCE', 'SENTBEFORE'):
+                sent = parsedate_to_datetime(re.search(r"^Date: (.*)$", headers, re.MULTILINE).group(1)).date()
+                bound = datetime.strptime(criteria.pop(0), '%d-%b-%Y').date()
+                if (key == 'SENTSINCE' and sent < bound) or (key == 'SENTBEFORE' and sent >= bound):
+                    return False
+            elif key in FLAG_KEYS:
+                flag, present = FLAG_KEYS[key]
+                if (flag in flags) != present:
+                    return False
+            elif key != 'ALL':
+                raise ValueError(f"Unsupported search key {key}")
+        return True
+
+
+class FakeLLM:
+    def __init__(self, pick=lambda subject, query: True, score=0.9):
+        """
+        Stands in for the model router: ranking replies list every email pick() accepts,
+        intent analysis echoes the query. Ranked prompts are recorded in self.ranked.
+        """
+        self.pick = pick
+        self.score = score
+        self.ranked = []
+
+    def complete(self, messages, max_tokens, temperature=0, query=''):
+        if 'JSON' not in messages[0]['content']:
+            return f"intent: {query}"
+        listing = messages[1]['content']
+        subjects = re.findall(r"Email (\d+):\nSubject: (.*)\n", listing)
+        self.ranked.append((query, [subject for _, subject in subjects]))
+        return '[' + ', '.join(
+            f'{{"email": {number}, "score": {self.score}, "reason": "r", "fields": ["subject"]}}'
+            for number, subject in subjects if self.pick(subject, query)
+        ) + ']'
+
+
+def make_chatbot(messages, llm=None):
+    """
+    A chatbot whose every IMAP connection is a FakeIMAP over messages, kept in chatbot.connections
+    """
+    chatbot = IntelligentEmailChatbot()
+    chatbot.connections = []
+
+    def connect():
+        chatbot.connections.append(FakeIMAP(messages))
+        return chatbot.connections[-1]
+
+    chatbot.connect_to_email = connect
+    chatbot.llm = llm or FakeLLM()
+    return chatbot
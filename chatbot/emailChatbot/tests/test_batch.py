@@ -0,0 +1,78 @@
+import json
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from .fakes import FakeLLM, epoch, make_chatbot, raw_message
+from .test_results import LOCAL_CACHES, ranked
+
+
+@override_settings(EMAIL_CHATBOT_INDEX_DIR='')
+class SearchBatchTests(SimpleTestCase):
+    def setUp(self):
+        self.messages = {
+            uid: (raw_message('ann@vendor.com' if uid % 2 else 'bob@corp.com', f"Message {uid}", 'Hello',
+                              epoch(2026, 3, uid)), [])
+            for uid in range(1, 9)
+        }
+
+    def test_queries_with_the_same_filters_share_one_walk(self):
+        chatbot = make_chatbot(self.messages)
+        results = chatbot.search_batch([
+            'invoices from @vendor.com', 'anything recent', 'contracts from @vendor.com', 'anything recent', ''
+        ], target_matches=2)
+
+        self.assertEqual(list(results), ['invoices from @vendor.com', 'anything recent', 'contracts from @vendor.com'])
+        searches = [search for connection in chatbot.connections for search in connection.searches()]
+        self.assertEqual(sorted(searches), [('ALL',), ('FROM', '"vendor.com"')])
+
+        # Candidates for the filtered group come from the IMAP search, not the unfiltered walk
+        for query, subjects in chatbot.llm.ranked:
+            expected_senders = {1} if 'vendor' in query else {0, 1}
+            self.assertLessEqual({int(subject.split()[1]) % 2 for subject in subjects}, expected_senders)
+        self.assertEqual([match['uid'] for match in results['invoices from @vendor.com']], ['7', '5', '3', '1'])
+        self.assertEqual(len(results['anything recent']), 8)
+
+    def test_walk_stops_once_every_query_is_satisfied(self):
+        messages = {uid: (raw_message('bob@corp.com', f"Message {uid}", 'Hello', epoch(2026, 1, 1) + uid), [])
+                    for uid in range(1, 41)}
+        wanted = {'Message 38', 'Message 33'}
+        chatbot = make_chatbot(messages, FakeLLM(pick=lambda subject, query: subject in wanted))
+        results = chatbot.search_batch(['message 38 or 33', 'message 33'], target_matches=1)
+
+        self.assertEqual([match['uid'] for match in results['message 38 or 33']], ['38', '33'])
+        # Both queries were satisfied by the first chunk of ten, so nothing older was fetched
+        fetched = [call[1] for call in chatbot.connections[0].calls if call[0] == 'fetch']
+        self.assertEqual(fetched, [b','.join(str(uid).encode() for uid in range(40, 30, -1))])
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class BatchApiTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch('emailChatbot.views.IntelligentEmailChatbot')
+        self.chatbot = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.chatbot.search_batch.side_effect = lambda queries: {query: ranked(3) for query in queries}
+        self.addCleanup(caches['results'].clear)
+
+    def post(self, payload):
+        return self.client.post('/api/batch/', json.dumps(payload), content_type='application/json')
+
+    def test_first_page_of_each_query(self):
+        response = self.post({'queries': ['invoices', 'contracts'], 'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([page['query'] for page in results], ['invoices', 'contracts'])
+        self.assertTrue(all(len(page['results']) == 2 and page['next_cursor'] for page in results))
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.client.get('/api/batch/').status_code, 405)
+        self.assertEqual(self.client.post('/api/batch/', 'nope', content_type='application/json').status_code, 400)
+        self.assertEqual(self.post({'queries': 'invoices'}).status_code, 400)
+        self.assertEqual(self.post({'queries': []}).status_code, 400)
+        self.assertEqual(self.post({'queries': ['q'] * 51}).status_code, 400)
+        self.assertEqual(self.post({'queries': ['invoices', '']}).status_code, 400)
+        self.assertEqual(self.post({'queries': ['invoices', 3]}).status_code, 400)
+        self.assertEqual(self.post({'queries': ['invoices'], 'page_size': 'two'}).status_code, 400)
+        self.chatbot.search_batch.assert_not_called()
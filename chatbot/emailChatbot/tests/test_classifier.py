@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+
+from ..classifier import BULK, PERSONAL, BulkMailClassifier, wants_bulk
+from .fakes import FakeLLM, epoch, make_chatbot, make_email, raw_message
+from .test_search import BULK_HEADERS, intent
+
+
+class ClassifierTests(SimpleTestCase):
+    def setUp(self):
+        self.classifier = BulkMailClassifier()
+        mailbox = [
+            make_email(uid, 'news@shop.com', 'Big sale', 'Half price on everything. View in browser. Unsubscribe.',
+                       bulk_signal='list-unsubscribe')
+            for uid in range(20)
+        ] + [
+            make_email(100 + uid, 'bob@corp.com', f"Meeting {uid}", 'Can we meet tomorrow about the contract?')
+            for uid in range(20)
+        ]
+        self.classifier.label(mailbox)
+
+    def test_labels_from_headers_reputation_and_words(self):
+        emails = self.classifier.label([
+            make_email(200, 'other@news.com', 'Hello', 'Hi', bulk_signal='list-id'),
+            make_email(201, 'news@shop.com', 'Weekly', 'Hello there'),
+            make_email(202, 'deals@else.com', 'Sale', 'Half price on everything. View in browser. Unsubscribe.'),
+            make_email(203, 'ann@corp.com', 'Contract', 'Can we meet about the contract?'),
+        ])
+        self.assertEqual([email['category'] for email in emails], [BULK, BULK, BULK, PERSONAL])
+
+    def test_saved_model_is_frozen(self):
+        path = os.path.join(tempfile.mkdtemp(), 'CLASSIFIER')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        self.classifier.save(path)
+        loaded = BulkMailClassifier.load(path)
+
+        self.assertTrue(loaded.frozen)
+        self.assertEqual(loaded.doc_counts, self.classifier.doc_counts)
+        email = make_email(300, 'news@shop.com', 'Weekly', 'Hello there')
+        self.assertEqual(loaded.label([email])[0]['category'], BULK)
+        self.assertEqual(loaded.doc_counts, self.classifier.doc_counts)
+
+    def test_wants_bulk_needs_a_bulk_noun(self):
+        self.assertTrue(wants_bulk('any newsletters this week?'))
+        self.assertTrue(wants_bulk('marketing emails from last month'))
+        self.assertFalse(wants_bulk('emails from the sales team about the offer'))
+        self.assertTrue(wants_bulk('security alerts'))
+
+
+@override_settings(EMAIL_CHATBOT_INDEX_DIR='')
+class BulkCandidateTests(SimpleTestCase):
+    def setUp(self):
+        # Everything from shop.com carries list headers; corp.com is personal mail
+        self.messages = {}
+        for uid in range(1, 31):
+            sender, headers = ('deals@shop.com', BULK_HEADERS) if uid % 3 else ('bob@corp.com', '')
+            self.messages[uid] = (raw_message(sender, f"Message {uid}", 'Hello', epoch(2026, 1, 1) + uid, headers), [])
+
+    def test_sender_filter_keeps_that_senders_bulk_mail(self):
+        chatbot = make_chatbot(self.messages)
+        matches, _ = chatbot.search_adaptive('receipts from @shop.com', intent())
+        self.assertTrue(matches)
+        self.assertTrue(all(int(match['uid']) % 3 for match in matches))
+        self.assertNotEqual(chatbot.process_request('receipts from deals@shop.com'), "No matching emails found.")
+
+    def test_bulk_mail_is_ranked_when_personal_mail_has_no_match(self):
+        chatbot = make_chatbot(self.messages, FakeLLM(pick=lambda subject, query: int(subject.split()[1]) % 3))
+        matches, _ = chatbot.search_adaptive('the order confirmation', intent())
+        self.assertTrue(matches)
+        # Personal mail was ranked first and found nothing, then the skipped bulk mail was ranked
+        *walk, fallback = chatbot.llm.ranked
+        self.assertTrue(all(int(subject.split()[1]) % 3 == 0 for _, subjects in walk for subject in subjects))
+        self.assertTrue(all(int(subject.split()[1]) % 3 for subject in fallback[1]))
+
+    def test_batch_falls_back_to_bulk_mail_per_query(self):
+        chatbot = make_chatbot(self.messages, FakeLLM(pick=lambda subject, query: 'order' in query or
+                                                      not int(subject.split()[1]) % 3))
+        results = chatbot.search_batch(['the order confirmation', 'lunch with bob'], target_matches=50)
+        self.assertTrue(results['the order confirmation'])
+        self.assertTrue(all(int(match['uid']) % 3 == 0 for match in results['lunch with bob']))
+        # Only the query without personal matches looked at the bulk mail
+        for query, subjects in chatbot.llm.ranked:
+            if query == 'lunch with bob':
+                self.assertTrue(all(int(subject.split()[1]) % 3 == 0 for subject in subjects))
@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..compression import CODEC_NONE, CODEC_ZLIB, DICTIONARY_FILE, BodyCodec, DictionaryStore, train_codec
+from ..snapshot import SnapshotReader, SnapshotWriter
+from .fakes import make_email
+
+
+class CompressionTests(SimpleTestCase):
+    def setUp(self):
+        self.index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.index_dir)
+        self.footer = 'Kind regards,\nThe Accounts Team\nThis message is confidential.'
+
+    def test_codec_round_trip(self):
+        bodies = [f"Invoice {number} is attached.\n{self.footer}" for number in range(20)] + ['Naïve café ☕']
+        codec = train_codec(bodies)
+        self.assertNotEqual(codec.kind, CODEC_NONE)
+        restored = BodyCodec(codec.kind, codec.dictionary)
+        for body in bodies:
+            self.assertEqual(restored.decompress(codec.compress(body)), body)
+        self.assertEqual(BodyCodec().decompress(BodyCodec().compress('plain')), 'plain')
+
+    def test_retrains_once_new_bytes_cross_the_threshold(self):
+        store = DictionaryStore(self.index_dir, retrain_bytes=100)
+        emails = [make_email(uid, 'a@b.com', 's', f"Note {uid}\n{self.footer}") for uid in range(1, 11)]
+        store.codec_for(emails)
+        first = os.listdir(self.index_dir)
+
+        # 60 new bytes: below the threshold, so the dictionary is kept but the bytes are remembered
+        store.codec_for([make_email(11, 'a@b.com', 's', 'x' * 60)] + emails)
+        self.assertEqual(sorted(os.listdir(self.index_dir)), sorted(first))
+
+        # Another 60 bytes in a later build crosses 100 in total
+        store.codec_for([make_email(12, 'a@b.com', 's', 'é' * 30)] + emails)
+        dictionaries = [name for name in os.listdir(self.index_dir) if name.startswith('dict-')]
+        self.assertEqual(len(dictionaries), 1)
+        self.assertNotIn(dictionaries[0], first)
+        self.assertIn(DICTIONARY_FILE, os.listdir(self.index_dir))
+
+
+    def test_zlib_dictionary_keeps_repeated_lines(self):
+        with mock.patch('emailChatbot.compression.zstandard', None):
+            codec = train_codec([f"Invoice {number}\n{self.footer}" for number in range(5)])
+        self.assertEqual(codec.kind, CODEC_ZLIB)
+        self.assertIn(b'The Accounts Team', codec.dictionary)
+        self.assertNotIn(b'Invoice 3', codec.dictionary)
+
+    def test_snapshot_bodies_are_compressed_and_restored(self):
+        bodies = [f"Invoice {number} is attached.\n{self.footer}" for number in range(20)]
+        SnapshotWriter(self.index_dir).write([
+            make_email(uid, 'a@b.com', 'Invoice', body) for uid, body in enumerate(bodies, 1)
+        ])
+        snapshot = SnapshotReader(self.index_dir).current()
+        self.assertNotEqual(snapshot.codec.kind, CODEC_NONE)
+        self.assertEqual([snapshot.record(position)['body'] for position in range(len(bodies))], bodies)
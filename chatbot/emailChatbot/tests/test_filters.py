@@ -0,0 +1,100 @@
+import shutil
+import tempfile
+from datetime import datetime, timezone
+
+from django.test import SimpleTestCase, override_settings
+
+from ..filters import imap_criteria, parse_filters
+from ..snapshot import SnapshotWriter
+from .fakes import epoch, make_chatbot, make_email, raw_message
+
+# 2026-03-15 12:00 UTC
+NOW = datetime(2026, 3, 15, 12, tzinfo=timezone.utc).timestamp()
+
+
+class FilterTests(SimpleTestCase):
+    def test_sender_filters(self):
+        self.assertEqual(parse_filters('mail from bob@corp.com', NOW), {'address': 'bob@corp.com'})
+        self.assertEqual(parse_filters('anything from @vendor.com', NOW), {'domain': 'vendor.com'})
+        self.assertEqual(parse_filters('emails from vendor.co.uk', NOW), {'domain': 'vendor.co.uk'})
+
+    def test_names_are_not_domains(self):
+        self.assertEqual(parse_filters('emails from john.smith', NOW), {})
+        self.assertEqual(parse_filters('updates from node.js', NOW), {})
+
+    def test_date_ranges(self):
+        self.assertEqual(parse_filters('invoices in February', NOW),
+                         {'since': epoch(2026, 2, 1), 'before': epoch(2026, 3, 1)})
+        # A month later than now means last year's
+        self.assertEqual(parse_filters('invoices in December', NOW),
+                         {'since': epoch(2025, 12, 1), 'before': epoch(2026, 1, 1)})
+        self.assertEqual(parse_filters('before 2026', NOW), {'before': epoch(2026, 1, 1)})
+        self.assertEqual(parse_filters('yesterday', NOW),
+                         {'since': epoch(2026, 3, 14), 'before': epoch(2026, 3, 15)})
+
+    def test_flags_and_negation(self):
+        self.assertEqual(parse_filters('unread and starred', NOW), {'unread': True, 'flagged': True})
+        self.assertEqual(parse_filters('emails I replied to', NOW), {'answered': True})
+        self.assertEqual(parse_filters('flagged emails from last week', NOW)['flagged'], True)
+        self.assertEqual(parse_filters("emails we've already answered", NOW), {'answered': True})
+        self.assertEqual(parse_filters('emails I have not replied to', NOW), {'answered': False})
+        self.assertEqual(parse_filters("haven't read yet", NOW), {'unread': True})
+        self.assertEqual(parse_filters('emails I read yesterday', NOW),
+                         {'since': epoch(2026, 3, 14), 'before': epoch(2026, 3, 15)})
+
+    def test_verbs_outside_flag_phrasing_are_not_flags(self):
+        self.assertEqual(parse_filters('which customers replied to the survey', NOW), {})
+        self.assertEqual(parse_filters('emails flagged as urgent by legal', NOW), {})
+        self.assertEqual(parse_filters('has the vendor answered our question', NOW), {})
+
+    def test_imap_criteria(self):
+        self.assertEqual(imap_criteria({}), ['ALL'])
+        self.assertEqual(
+            imap_criteria({'domain': 'vendor.com', 'since': epoch(2026, 2, 1), 'before': epoch(2026, 3, 1),
+                           'unread': True, 'answered': False}),
+            # Widened by a day each way: the server compares the Date header's local day
+            ['FROM', '"vendor.com"', 'SENTSINCE', '31-Jan-2026', 'SENTBEFORE', '02-Mar-2026', 'UNSEEN', 'UNANSWERED']
+        )
+
+
+
+@override_settings(EMAIL_CHATBOT_INDEX_DIR='')
+class ImapFilterTests(SimpleTestCase):
+    def test_date_header_in_another_zone(self):
+        # 1 March 04:00 UTC, but 28 February on the sender's own calendar
+        late = (b"From: Ann <ann@vendor.com>\r\nSubject: Late invoice\r\n"
+                b"Date: Sat, 28 Feb 2026 20:00:00 -0800\r\n\r\nHello")
+        early = raw_message('ann@vendor.com', 'February invoice', 'Hello', epoch(2026, 2, 27))
+        chatbot = make_chatbot({1: (early, []), 2: (late, [])})
+        chunks = chatbot.iter_email_chunks(filters=parse_filters('invoices in March', NOW))
+        self.assertEqual([email['subject'] for chunk in chunks for email in chunk], ['Late invoice'])
+
+
+class SnapshotFlagTests(SimpleTestCase):
+    def setUp(self):
+        self.index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.index_dir)
+        override = override_settings(EMAIL_CHATBOT_INDEX_DIR=self.index_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        # Built while nothing had been read
+        SnapshotWriter(self.index_dir).write([
+            make_email(uid, 'ann@vendor.com', f"Message {uid}", 'Hello', epoch(2026, 3, uid)) for uid in (3, 2, 1)
+        ])
+        self.messages = {
+            uid: (raw_message('ann@vendor.com', f"Message {uid}", 'Hello', epoch(2026, 3, uid)), flags)
+            for uid, flags in ((1, []), (2, ['\\Seen']), (3, ['\\Seen', '\\Flagged']))
+        }
+
+    def uids(self, chatbot, filters):
+        return [email['uid'] for chunk in chatbot.iter_email_chunks(filters=filters) for email in chunk]
+
+    def test_flag_filters_use_the_current_flags(self):
+        chatbot = make_chatbot(self.messages)
+        self.assertEqual(self.uids(chatbot, {'unread': True}), ['1'])
+        self.assertEqual(self.uids(chatbot, {'flagged': True, 'domain': 'vendor.com'}), ['3'])
+
+    def test_snapshot_flags_when_the_server_is_unreachable(self):
+        chatbot = make_chatbot(self.messages)
+        chatbot.connect_to_email = lambda: None
+        self.assertEqual(self.uids(chatbot, {'unread': True}), ['3', '2', '1'])
@@ -0,0 +1,109 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from django.test import SimpleTestCase, override_settings
+
+from ..llm import ContextOverflow, ModelRouter, ModelTier, OpenAICompatibleBackend, build_router
+
+TIERS = [ModelTier('fast', 'small-model', 8192), ModelTier('large', 'big-model', 131072)]
+
+
+def prompt(text):
+    return [{'role': 'system', 'content': 'Rank emails'}, {'role': 'user', 'content': text}]
+
+
+class RecordingBackend:
+    def __init__(self, failures=None):
+        """
+        Returns the model name; failures maps a model to the exception it raises
+        """
+        self.failures = failures or {}
+        self.models = []
+
+    def complete(self, messages, model, max_tokens, temperature):
+        self.models.append(model)
+        if model in self.failures:
+            raise self.failures[model]
+        return model
+
+
+class ModelRouterTests(SimpleTestCase):
+    def test_select_by_complexity_and_size(self):
+        router = ModelRouter(RecordingBackend(), TIERS, complexity_threshold=4)
+        self.assertEqual(router.select(prompt('invoice from bob'), 500, 'invoice from bob').name, 'fast')
+
+        complex_query = 'emails from bob and alice between march and may which I have not answered'
+        self.assertEqual(router.select(prompt(complex_query), 500, complex_query).name, 'large')
+        self.assertEqual(router.select(prompt('x' * 40000), 500, 'invoice').name, 'large')
+        # Nothing fits: the largest tier is the best there is
+        self.assertEqual(router.select(prompt('x' * 800000), 500, 'invoice').name, 'large')
+
+    def test_context_overflow_retries_on_the_larger_tier(self):
+        backend = RecordingBackend({'small-model': ContextOverflow('context_length_exceeded')})
+        router = ModelRouter(backend, TIERS)
+        self.assertEqual(router.complete(prompt('hi'), 100, query='hi'), 'big-model')
+        self.assertEqual(backend.models, ['small-model', 'big-model'])
+
+    def test_other_errors_are_not_retried(self):
+        backend = RecordingBackend({'small-model': RuntimeError('context manager broke')})
+        router = ModelRouter(backend, TIERS)
+        with self.assertRaises(RuntimeError):
+            router.complete(prompt('hi'), 100, query='hi')
+        self.assertEqual(backend.models, ['small-model'])
+
+    def test_overflow_on_the_largest_tier_is_raised(self):
+        backend = RecordingBackend({'big-model': ContextOverflow('too long')})
+        with self.assertRaises(ContextOverflow):
+            ModelRouter(backend, TIERS).complete(prompt('x' * 40000), 100, query='hi')
+
+
+class CompletionsHandler(BaseHTTPRequestHandler):
+    # The fast model rejects every prompt as too long, like a server with a tiny context
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.models.append(request['model'])
+        if request['model'] == 'small-model':
+            status, reply = 400, {'error': {'message': 'Please reduce the length of the messages.',
+                                            'code': 'context_length_exceeded'}}
+        elif request['model'] == 'broken-model':
+            status, reply = 500, {'error': {'message': 'upstream unavailable'}}
+        else:
+            status, reply = 200, {'choices': [{'message': {'content': f"from {request['model']}"}}]}
+        body = json.dumps(reply).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class OpenAICompatibleBackendTests(SimpleTestCase):
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), CompletionsHandler)
+        self.server.models = []
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}/v1"
+
+    def test_overflow_in_the_error_body_falls_back(self):
+        router = ModelRouter(OpenAICompatibleBackend(self.base_url), TIERS)
+        self.assertEqual(router.complete(prompt('hi'), 100, query='hi'), 'from big-model')
+        self.assertEqual(self.server.models, ['small-model', 'big-model'])
+
+    def test_other_http_errors_include_the_body(self):
+        backend = OpenAICompatibleBackend(self.base_url)
+        with self.assertRaisesRegex(RuntimeError, 'upstream unavailable'):
+            backend.complete(prompt('hi'), 'broken-model', 100, 0)
+
+    def test_build_router_uses_the_configured_server(self):
+        config = {'BASE_URL': self.base_url, 'FAST_MODEL': 'small-model', 'LARGE_MODEL': 'big-model'}
+        with override_settings(EMAIL_CHATBOT_LLM=config):
+            router = build_router(groq_client=None)
+        self.assertIsInstance(router.backend, OpenAICompatibleBackend)
+        self.assertEqual(router.complete(prompt('hi'), 100, query='hi'), 'from big-model')
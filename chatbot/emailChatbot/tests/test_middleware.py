@@ -0,0 +1,81 @@
+import os
+import pstats
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from django.http import Http404, HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from .. import middleware
+from ..middleware import ProfilingMiddleware, profiled
+from ..views import profile_download
+
+
+def worker_task():
+    return sum(number * number for number in range(1000))
+
+
+def view(request):
+    # Stands in for search: part of the work happens on a worker thread
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        total = executor.submit(profiled(worker_task)).result()
+    return HttpResponse(str(total))
+
+
+class ProfilingMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir)
+        override = override_settings(EMAIL_CHATBOT_PROFILE_DIR=self.profile_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.factory = RequestFactory()
+
+    def request(self, is_staff=True, **headers):
+        request = self.factory.get('/api/search/', {'q': 'invoices'}, **headers)
+        request.user = SimpleNamespace(is_staff=is_staff)
+        return request
+
+    def test_staff_request_with_header_is_profiled(self):
+        response = ProfilingMiddleware(view)(self.request(HTTP_X_PROFILE='1'))
+        profile_id = response['X-Profile-Id']
+        self.assertTrue(os.path.exists(os.path.join(self.profile_dir, f"{profile_id}.txt")))
+
+        stats = pstats.Stats(os.path.join(self.profile_dir, f"{profile_id}.prof"))
+        functions = {name for _, _, name in stats.stats}
+        self.assertIn('worker_task', functions)
+        self.assertIn('view', functions)
+
+    def test_requests_without_the_header_or_staff_are_untouched(self):
+        for request in (self.request(), self.request(is_staff=False, HTTP_X_PROFILE='1')):
+            response = ProfilingMiddleware(view)(request)
+            self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(os.listdir(self.profile_dir), [])
+
+    def test_disabled_without_a_profile_dir(self):
+        with override_settings(EMAIL_CHATBOT_PROFILE_DIR=''):
+            response = ProfilingMiddleware(view)(self.request(HTTP_X_PROFILE='1'))
+        self.assertNotIn('X-Profile-Id', response)
+
+    def test_one_profile_at_a_time(self):
+        middleware._profile_lock.acquire()
+        try:
+            response = ProfilingMiddleware(view)(self.request(HTTP_X_PROFILE='1'))
+        finally:
+            middleware._profile_lock.release()
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertIn('X-Profile-Skipped', response)
+        self.assertEqual(response.content, str(worker_task()).encode())
+
+    def test_profiled_is_a_no_op_outside_a_profile(self):
+        self.assertIs(profiled(worker_task), worker_task)
+
+    def test_download_is_staff_only(self):
+        profile_id = ProfilingMiddleware(view)(self.request(HTTP_X_PROFILE='1'))['X-Profile-Id']
+        response = profile_download(self.request(), profile_id)
+        self.assertEqual(response.status_code, 200)
+        response.close()
+        with self.assertRaises(Http404):
+            profile_download(self.request(is_staff=False), profile_id)
@@ -0,0 +1,74 @@
+import json
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from ..results import decode_cursor, encode_cursor
+
+LOCAL_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'results': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-results'},
+}
+
+
+def ranked(count):
+    return [
+        {'uid': str(uid), 'message_id': f"<{uid}@test>", 'score': 0.9, 'reason': 'r', 'highlights': {}}
+        for uid in range(count, 0, -1)
+    ]
+
+
+class CursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor('abc123', 20)), ('abc123', 20))
+
+    def test_rejects_malformed_cursors(self):
+        self.assertIsNone(decode_cursor('not a cursor'))
+        self.assertIsNone(decode_cursor(''))
+        self.assertIsNone(decode_cursor(encode_cursor('abc123', -5)))
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class SearchApiTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch('emailChatbot.views.IntelligentEmailChatbot')
+        self.chatbot = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.chatbot.search.return_value = ranked(5)
+        self.addCleanup(caches['results'].clear)
+
+    def test_pages_follow_the_cursor(self):
+        page = self.client.get('/api/search/', {'q': 'invoices', 'page_size': 2}).json()
+        self.assertEqual(page['total'], 5)
+        uids = [match['uid'] for match in page['results']]
+
+        while page['next_cursor']:
+            page = self.client.get('/api/search/', {'cursor': page['next_cursor'], 'page_size': 2}).json()
+            uids.extend(match['uid'] for match in page['results'])
+
+        self.assertEqual(uids, ['5', '4', '3', '2', '1'])
+        # Later pages come from the cache, not another search
+        self.assertEqual(self.chatbot.search.call_count, 1)
+
+    def test_expired_result_set_is_gone(self):
+        page = self.client.get('/api/search/', {'q': 'invoices', 'page_size': 2}).json()
+        caches['results'].clear()
+        response = self.client.get('/api/search/', {'cursor': page['next_cursor']})
+        self.assertEqual(response.status_code, 410)
+
+    def test_posted_query(self):
+        response = self.client.post('/api/search/', json.dumps({'query': 'invoices'}), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.chatbot.search.assert_called_once_with('invoices')
+
+    def test_rejects_bad_input(self):
+        self.assertEqual(self.client.get('/api/search/').status_code, 400)
+        self.assertEqual(self.client.get('/api/search/', {'cursor': 'garbage'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/search/', {'q': 'x', 'page_size': 'ten'}).status_code, 400)
+        self.assertEqual(self.client.post('/api/search/', 'not json', content_type='application/json').status_code, 400)
+        self.chatbot.search.assert_not_called()
+
+    def test_search_failure_is_a_bad_gateway(self):
+        self.chatbot.search.side_effect = RuntimeError('LLM down')
+        self.assertEqual(self.client.get('/api/search/', {'q': 'invoices'}).status_code, 502)
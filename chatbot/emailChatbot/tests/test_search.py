@@ -0,0 +1,77 @@
+import shutil
+import tempfile
+from concurrent.futures import Future
+
+from django.test import SimpleTestCase, override_settings
+
+from ..snapshot import SnapshotWriter
+from .fakes import FakeLLM, epoch, make_chatbot, make_email, raw_message
+
+BULK_HEADERS = 'List-Unsubscribe: <mailto:leave@shop.com>\r\n'
+
+
+def mailbox(count, headers=''):
+    return {
+        uid: (raw_message('bob@corp.com', f"Message {uid}", 'Hello', epoch(2026, 1, 1) + uid, headers), [])
+        for uid in range(1, count + 1)
+    }
+
+
+def intent():
+    future = Future()
+    future.set_result('find messages')
+    return future
+
+
+def fetched(chatbot):
+    return [call[1].count(b',') + 1 for connection in chatbot.connections
+            for call in connection.calls if call[0] == 'fetch']
+
+
+@override_settings(EMAIL_CHATBOT_INDEX_DIR='')
+class DeepeningTests(SimpleTestCase):
+    def test_chunks_double_up_to_the_cap(self):
+        chatbot = make_chatbot(mailbox(100))
+        chunks = list(chatbot.iter_email_chunks(chunk_size=10, max_chunk=40, max_emails=100))
+        self.assertEqual([len(chunk) for chunk in chunks], [10, 20, 40, 30])
+        self.assertEqual(chunks[0][0]['uid'], '100')
+        self.assertEqual(chunks[-1][-1]['uid'], '1')
+
+    def test_max_emails_limits_the_walk(self):
+        chatbot = make_chatbot(mailbox(100))
+        chunks = list(chatbot.iter_email_chunks(chunk_size=10, max_emails=50))
+        self.assertEqual([len(chunk) for chunk in chunks], [10, 20, 20])
+
+    def test_walk_continues_over_imap_below_the_snapshot(self):
+        index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, index_dir)
+        SnapshotWriter(index_dir).write([
+            make_email(uid, 'bob@corp.com', f"Message {uid}", 'Hello', epoch(2026, 1, 1) + uid)
+            for uid in range(60, 40, -1)
+        ])
+        chatbot = make_chatbot(mailbox(60))
+        with override_settings(EMAIL_CHATBOT_INDEX_DIR=index_dir):
+            chunks = list(chatbot.iter_email_chunks(chunk_size=5, max_chunk=10))
+
+        uids = [int(email['uid']) for chunk in chunks for email in chunk]
+        self.assertEqual(uids, list(range(60, 0, -1)))
+        # The second snapshot chunk skips the records already served in the first
+        self.assertEqual([len(chunk) for chunk in chunks], [5, 5, 10, 10, 10, 10, 10])
+        self.assertEqual(chatbot.connections[-1].searches(), [('UID', '1:40')])
+
+    def test_search_stops_with_enough_confident_matches(self):
+        chatbot = make_chatbot(mailbox(100))
+        matches, _ = chatbot.search_adaptive('messages', intent(), target_matches=5)
+        self.assertEqual(len(matches), 10)
+        self.assertEqual(fetched(chatbot), [10])
+
+    def test_low_scores_keep_the_walk_going(self):
+        chatbot = make_chatbot(mailbox(100), FakeLLM(score=0.3))
+        chatbot.search_adaptive('messages', intent(), target_matches=5, token_budget=10 ** 6)
+        self.assertEqual(sum(fetched(chatbot)), 100)
+
+    def test_deadline_applies_to_chunks_without_candidates(self):
+        # Every message is bulk and the query does not ask for bulk, so no chunk is ranked
+        chatbot = make_chatbot(mailbox(100, BULK_HEADERS))
+        chatbot.search_adaptive('messages', intent(), time_budget=0)
+        self.assertEqual(fetched(chatbot), [10])
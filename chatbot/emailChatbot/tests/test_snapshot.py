@@ -0,0 +1,118 @@
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+
+from ..filters import matches
+from ..snapshot import MailboxSnapshot, SnapshotReader, SnapshotWriter
+from .fakes import epoch, make_chatbot, make_email, raw_message
+
+
+class SnapshotTests(SimpleTestCase):
+    def setUp(self):
+        self.index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.index_dir)
+        # Newest first, as get_emails returns them
+        self.emails = [
+            make_email(5, 'alice@mail.vendor.com', 'Invoice for March', 'Please find the invoice attached.',
+                       epoch(2026, 3, 10), flags=['seen']),
+            make_email(4, 'bob@corp.com', 'Lunch plans', 'Are you free for lunch on Friday?',
+                       epoch(2026, 2, 20), flags=['flagged']),
+            make_email(3, 'alice@mail.vendor.com', 'Contract renewal', 'The contract renewal is due soon.',
+                       epoch(2026, 2, 1), flags=['seen', 'answered']),
+            make_email(2, 'news@shop.example.org', 'Weekly deals', 'Café specials this week only.',
+                       None),
+            make_email(1, 'bob@corp.com', 'Welcome', 'Welcome to the team!',
+                       epoch(2025, 12, 24), flags=['seen']),
+        ]
+        SnapshotWriter(self.index_dir).write(self.emails)
+        self.snapshot = SnapshotReader(self.index_dir).current()
+
+    def test_records_round_trip_through_offset_tables(self):
+        self.assertIsInstance(self.snapshot, MailboxSnapshot)
+        self.assertEqual(len(self.snapshot), len(self.emails))
+        for position, email in enumerate(self.emails):
+            stored = self.snapshot.record(position)
+            self.assertEqual(stored['uid'], email['uid'])
+            self.assertEqual(stored['subject'], email['subject'])
+            self.assertEqual(stored['flags'], email['flags'])
+            self.assertEqual(stored['body'], email['body'])
+        self.assertEqual([email['uid'] for email in self.snapshot.records(2, 1)], ['4', '3'])
+
+    def test_postings_for_words_and_secondary_keys(self):
+        self.assertEqual(self.snapshot.postings('invoice'), [0])
+        self.assertEqual(self.snapshot.postings('café'), [3])
+        self.assertEqual(self.snapshot.postings('address:bob@corp.com'), [1, 4])
+        # Parent domains are indexed too
+        self.assertEqual(self.snapshot.postings('domain:vendor.com'), [0, 2])
+        self.assertEqual(self.snapshot.postings('flag:answered'), [2])
+        self.assertEqual(self.snapshot.postings('missing'), [])
+
+    def test_dated_between_binary_search(self):
+        self.assertEqual(self.snapshot.dated_between(epoch(2026, 2, 1), epoch(2026, 3, 1)), {1, 2})
+        self.assertEqual(self.snapshot.dated_between(epoch(2026, 2, 2), None), {0, 1})
+        self.assertEqual(self.snapshot.dated_between(None, epoch(2026, 1, 1)), {4})
+        self.assertEqual(self.snapshot.dated_between(epoch(2027, 1, 1), None), set())
+
+    def test_lookup_combines_filters(self):
+        self.assertEqual(self.snapshot.lookup({'domain': 'vendor.com'}), [0, 2])
+        self.assertEqual(self.snapshot.lookup({'domain': 'vendor.com', 'answered': False}), [0])
+        self.assertEqual(self.snapshot.lookup({'unread': True}), [1, 3])
+        self.assertEqual(self.snapshot.lookup({'address': 'bob@corp.com', 'since': epoch(2026, 1, 1)}), [1])
+        self.assertEqual(self.snapshot.lookup({'address': 'nobody@corp.com'}), [])
+
+    def test_lookup_agrees_with_matches(self):
+        for filters in ({'domain': 'corp.com'}, {'flagged': True}, {'since': epoch(2026, 2, 1), 'unread': False}):
+            expected = [position for position, email in enumerate(self.emails) if matches(email, filters)]
+            self.assertEqual(self.snapshot.lookup(filters), expected, filters)
+
+    def test_new_generation_becomes_current(self):
+        SnapshotWriter(self.index_dir).write(self.emails[:2])
+        self.assertEqual(len(SnapshotReader(self.index_dir).current()), 2)
+
+
+
+class SnapshotFreshnessTests(SimpleTestCase):
+    def setUp(self):
+        self.index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.index_dir)
+        override = override_settings(EMAIL_CHATBOT_INDEX_DIR=self.index_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        senders = {uid: 'alice@vendor.com' if uid % 2 else 'bob@corp.com' for uid in range(1, 8)}
+        self.messages = {
+            uid: (raw_message(senders[uid], f"Message {uid}", f"Body {uid}", epoch(2026, 3, uid)), [])
+            for uid in range(1, 8)
+        }
+        # The snapshot was built when UIDs 3-5 were the newest mail; 1-2 are older, 6-7 arrived since
+        SnapshotWriter(self.index_dir).write([
+            make_email(uid, senders[uid], f"Message {uid}", f"Body {uid}", epoch(2026, 3, uid))
+            for uid in (5, 4, 3)
+        ])
+
+    def test_walk_serves_mail_newer_than_the_snapshot_first(self):
+        chatbot = make_chatbot(self.messages)
+        chunks = list(chatbot.iter_email_chunks(chunk_size=3))
+        self.assertEqual([email['uid'] for chunk in chunks for email in chunk], ['7', '6', '5', '4', '3', '2', '1'])
+        self.assertEqual(chatbot.connections[0].searches()[0], ('UID', '6:*'))
+        self.assertEqual(chatbot.connections[1].searches()[0], ('UID', '1:2'))
+
+    def test_get_emails_includes_new_mail(self):
+        chatbot = make_chatbot(self.messages)
+        self.assertEqual([email['uid'] for email in chatbot.get_emails(limit=3)], ['7', '6', '5'])
+
+    def test_filtered_walk_checks_new_mail(self):
+        chatbot = make_chatbot(self.messages)
+        chunks = list(chatbot.iter_email_chunks(filters={'domain': 'vendor.com'}))
+        self.assertEqual([email['uid'] for chunk in chunks for email in chunk], ['7', '5', '3', '1'])
+
+    def test_nothing_is_fetched_without_new_mail(self):
+        del self.messages[6], self.messages[7]
+        chatbot = make_chatbot(self.messages)
+        chunks = chatbot.iter_email_chunks()
+        self.assertEqual([email['uid'] for email in next(chunks)], ['5', '4', '3'])
+        chunks.close()
+        # "UID 6:*" still answers with UID 5, which is already in the snapshot
+        self.assertEqual(chatbot.connections[0].searches(), [('UID', '6:*')])
+        self.assertFalse([call for call in chatbot.connections[0].calls if call[0] == 'fetch'])
@@ -1,7 +1,10 @@
-from django.urls import path # type: ignore
+from django.urls import path, re_path # type: ignore
 from django.views.decorators.csrf import csrf_exempt # type: ignore
 from . import views
 
 urlpatterns = [
-    path('', views.index, name="index")
-]
\ No newline at end of file
+    path('', views.index, name="index"),
+    path('api/search/', csrf_exempt(views.search_api), name="search_api"),
+    path('api/batch/', csrf_exempt(views.batch_api), name="batch_api"),
+    re_path(r'^profiles/(?P<profile_id>[0-9a-f]{32})/$', views.profile_download, name="profile_download")
+]
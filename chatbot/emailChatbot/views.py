@@ -1,13 +1,29 @@
 import imaplib
 import email
 from email.header import decode_header
+from email.utils import parseaddr, parsedate_to_datetime
 from groq import Groq
 import os
-from typing import List, Dict, Optional
-from django.http import JsonResponse
+from typing import Iterator, List, Dict, Optional, Tuple
+from django.conf import settings
+from django.http import FileResponse, Http404, JsonResponse
 from django.shortcuts import render
+import html
 import json
+import re
+import time
+from datetime import timezone
+from itertools import repeat
 from concurrent.futures import ThreadPoolExecutor
+from .classifier import BULK, BulkMailClassifier, header_signal, load_classifier, wants_bulk
+from .filters import FLAG_FILTERS, imap_criteria, matches, parse_filters
+from .llm import build_router
+from .middleware import allocation_checkpoint, profiled
+from .results import ResultStore, decode_cursor
+from .snapshot import get_snapshot
+
+# Bulk mail skipped during a search that gets one ranking pass if nothing else matched
+BULK_FALLBACK_LIMIT = 40
 
 class IntelligentEmailChatbot:
     def __init__(self):
@@ -18,6 +34,9 @@ class IntelligentEmailChatbot:
         self.password = "twrw ecjk ttjr fvmw"
         self.groq_api_key = "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"
         self.groq_client = Groq(api_key=self.groq_api_key)
+        self.llm = build_router(self.groq_client)
+        # Prefer the model trained on the whole mailbox; without one, learn from what is fetched
+        self.classifier = load_classifier() or BulkMailClassifier()
 
         # IMAP settings
         self.imap_server = "imap.gmail.com"
@@ -35,10 +54,25 @@ class IntelligentEmailChatbot:
             print(f"Connection error: {e}")
             return None
 
-    def get_emails(self, limit: int = 10) -> List[Dict[str, str]]:
+    def get_emails(self, limit: int = 10, query: str = "", use_snapshot: bool = True) -> List[Dict[str, str]]:
         """
-        Retrieve emails from the inbox
+        Retrieve emails from the shared snapshot when one is published, otherwise from the inbox.
+        Mail that arrived after the snapshot was built comes first; then, with a query,
+        snapshot hits, and the newest snapshot emails fill the rest.
         """
+        snapshot = get_snapshot() if use_snapshot else None
+        if snapshot is not None and len(snapshot):
+            emails = []
+            chunks = self._walk_mailbox(query, None, repeat(limit), limit)
+            try:
+                for chunk in chunks:
+                    emails.extend(chunk)
+                    if len(emails) >= limit:
+                        break
+            finally:
+                chunks.close()
+            return emails[:limit]
+
         emails = []
         try:
             mail = self.connect_to_email()
@@ -46,25 +80,10 @@ class IntelligentEmailChatbot:
                 return []
 
             mail.select('inbox')
-            _, search_data = mail.search(None, 'ALL')
-            email_ids = search_data[0].split()
-
-            for email_id in reversed(email_ids[-limit:]):
-                _, msg_data = mail.fetch(email_id, '(RFC822)')
-                for response_part in msg_data:
-                    if isinstance(response_part, tuple):
-                        email_body = response_part[1]
-                        email_message = email.message_from_bytes(email_body)
-
-                        subject = self._decode_header(email_message['Subject'])
-                        sender = self._decode_header(email_message['From'])
-                        body = self._extract_email_body(email_message)
-
-                        emails.append({
-                            'subject': subject,
-                            'sender': sender,
-                            'body': body
-                        })
+            _, search_data = mail.uid('search', None, 'ALL')
+            email_uids = search_data[0].split()
+
+            emails = self._fetch_uids(mail, list(reversed(email_uids[-limit:])))
 
             mail.close()
             mail.logout()
@@ -73,6 +92,203 @@ class IntelligentEmailChatbot:
 
         return emails
 
+    def iter_email_chunks(self, query: str = "", filters: Optional[Dict] = None, chunk_size: int = 10,
+                          max_chunk: int = 40, max_emails: int = 500) -> Iterator[List[Dict[str, str]]]:
+        """
+        Yield emails newest first in chunks that double in size as the search goes deeper
+        into older UID ranges. Sender/date/flag filters are answered from the snapshot's
+        secondary indexes or by IMAP SEARCH before anything is fetched. With a snapshot,
+        mail above its newest UID is fetched over IMAP first, and once the snapshot is
+        exhausted the walk continues over IMAP below its oldest UID; max_emails caps how
+        many messages each of those IMAP walks fetches. If the filters match nothing
+        anywhere, the whole mailbox is walked instead.
+        Close the generator to release the IMAP connection early.
+        """
+        if filters:
+            found = False
+            chunks = self._walk_mailbox(query, filters, self._chunk_sizes(chunk_size, max_chunk), max_emails)
+            try:
+                for chunk in chunks:
+                    found = found or bool(chunk)
+                    yield chunk
+            finally:
+                chunks.close()
+            if found:
+                return
+            # The filters may have been misread from the query, so let ranking see everything
+        yield from self._walk_mailbox(query, None, self._chunk_sizes(chunk_size, max_chunk), max_emails)
+
+    def _walk_mailbox(self, query: str, filters: Optional[Dict], sizes: Iterator[int],
+                      max_emails: int) -> Iterator[List[Dict[str, str]]]:
+        snapshot = get_snapshot()
+        if snapshot is None or not len(snapshot):
+            yield from self._imap_chunks(filters, sizes, max_emails)
+            return
+
+        # Records are stored newest first. Mail delivered since the last build_mailbox_index
+        # run is only on the server, so it is walked before the snapshot.
+        yield from self._imap_chunks(filters, sizes, max_emails, above_uid=int(snapshot.record(0)['uid']))
+
+        if filters:
+            positions = self._snapshot_positions(snapshot, filters)
+            start = 0
+            while start < len(positions):
+                size = next(sizes)
+                yield [snapshot.record(position) for position in positions[start:start + size]]
+                start += size
+        else:
+            # The first chunk puts the snapshot's hits for the query ahead of the newest records
+            size = next(sizes)
+            first = snapshot.search(query, size) if query else []
+            hits = {email['uid'] for email in first}
+            first = (first + [email for email in snapshot.records(size) if email['uid'] not in hits])[:size]
+            yield first
+            seen = {email['uid'] for email in first}
+            start = 0
+            while start < len(snapshot):
+                size = next(sizes)
+                chunk = [email for email in snapshot.records(size, start) if email['uid'] not in seen]
+                if chunk:
+                    yield chunk
+                start += size
+
+        below_uid = int(snapshot.record(len(snapshot) - 1)['uid'])
+        if below_uid > 1:
+            yield from self._imap_chunks(filters, sizes, max_emails, below_uid=below_uid)
+
+    def _snapshot_positions(self, snapshot, filters: Dict) -> List[int]:
+        """
+        Snapshot positions matching filters. Flags change as soon as mail is read or answered,
+        so flag filters are answered by one UID SEARCH; the flags frozen in the snapshot are
+        only used when the server cannot be reached.
+        """
+        flag_filters = {name: value for name, value in filters.items() if name in FLAG_FILTERS}
+        current_uids = self._search_uids(imap_criteria(flag_filters)) if flag_filters else None
+        if current_uids is None:
+            return snapshot.lookup(filters)
+
+        positions = snapshot.lookup({name: value for name, value in filters.items() if name not in FLAG_FILTERS})
+        return [position for position in positions if int(snapshot.record(position)['uid']) in current_uids]
+
+    def _search_uids(self, criteria: List[str]) -> Optional[set]:
+        """
+        UIDs matching an IMAP SEARCH, or None if the server cannot be asked
+        """
+        mail = self.connect_to_email()
+        if not mail:
+            return None
+        try:
+            mail.select('inbox')
+            _, search_data = mail.uid('search', None, *criteria)
+            return {int(uid) for uid in search_data[0].split()}
+        except Exception as e:
+            print(f"Error searching emails: {e}")
+            return None
+        finally:
+            try:
+                mail.close()
+                mail.logout()
+            except Exception:
+                pass
+
+    def _chunk_sizes(self, chunk_size: int, max_chunk: int) -> Iterator[int]:
+        size = chunk_size
+        while True:
+            yield size
+            size = min(size * 2, max_chunk)
+
+    def _imap_chunks(self, filters: Optional[Dict], sizes: Iterator[int], max_emails: int,
+                     above_uid: Optional[int] = None, below_uid: Optional[int] = None) -> Iterator[List[Dict[str, str]]]:
+        """
+        Walk the inbox over IMAP newest first, optionally only UIDs strictly between above_uid and below_uid
+        """
+        mail = self.connect_to_email()
+        if not mail:
+            return
+        try:
+            mail.select('inbox')
+            criteria = imap_criteria(filters or {})
+            if above_uid is not None or below_uid is not None:
+                low = 1 if above_uid is None else above_uid + 1
+                high = '*' if below_uid is None else below_uid - 1
+                criteria = ['UID', f"{low}:{high}"] + [key for key in criteria if key != 'ALL']
+            _, search_data = mail.uid('search', None, *criteria)
+            # "n:*" always matches the newest message, even when its UID is below n
+            email_uids = [
+                uid for uid in reversed(search_data[0].split()) if above_uid is None or int(uid) > above_uid
+            ][:max_emails]
+
+            start = 0
+            while start < len(email_uids):
+                size = next(sizes)
+                chunk = self._fetch_uids(mail, email_uids[start:start + size])
+                yield [email for email in chunk if matches(email, filters)] if filters else chunk
+                start += size
+        except Exception as e:
+            print(f"Error retrieving emails: {e}")
+        finally:
+            try:
+                mail.close()
+                mail.logout()
+            except Exception:
+                pass
+
+    def _fetch_uids(self, mail: imaplib.IMAP4_SSL, email_uids: List[bytes]) -> List[Dict[str, str]]:
+        """
+        Fetch and parse a set of UIDs in one round trip, keeping the requested order
+        """
+        if not email_uids:
+            return []
+
+        # BODY.PEEK leaves \Seen alone, so fetching does not change the flags we index
+        _, msg_data = mail.uid('fetch', b','.join(email_uids), '(UID FLAGS BODY.PEEK[])')
+        parsed = {}
+        for response_part in msg_data:
+            if isinstance(response_part, tuple):
+                match = re.search(rb"UID (\d+)", response_part[0])
+                if match:
+                    uid = match.group(1).decode()
+                    flags = re.search(rb"FLAGS \(([^)]*)\)", response_part[0])
+                    parsed[uid] = self._parse_message(uid, response_part[1], flags.group(1).decode().split() if flags else [])
+
+        return self.classifier.label([parsed[uid.decode()] for uid in email_uids if uid.decode() in parsed])
+
+    def _parse_message(self, uid: str, raw_email: bytes, flags: Optional[List[str]] = None) -> Dict[str, str]:
+        """
+        Parse a raw RFC822 message into the fields used for filtering and indexing
+        """
+        email_message = email.message_from_bytes(raw_email)
+        sender = self._decode_header(email_message['From'])
+        sender_name, sender_address = parseaddr(sender)
+        sender_address = sender_address.lower()
+        return {
+            'uid': uid,
+            'message_id': (email_message['Message-ID'] or '').strip(),
+            'subject': self._decode_header(email_message['Subject']),
+            'sender': sender,
+            'sender_name': sender_name,
+            'sender_address': sender_address,
+            'sender_domain': sender_address.rpartition('@')[2],
+            'date': self._parse_date(email_message['Date']),
+            'flags': [flag.lstrip('\\').lower() for flag in flags or []],
+            'body': self._extract_email_body(email_message),
+            'bulk_signal': header_signal(email_message)
+        }
+
+    def _parse_date(self, header: Optional[str]) -> Optional[int]:
+        """
+        Normalise a Date header to a UTC epoch; dates without a zone are taken as UTC
+        """
+        if not header:
+            return None
+        try:
+            parsed = parsedate_to_datetime(str(header))
+        except (TypeError, ValueError, IndexError):
+            return None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return int(parsed.timestamp())
+
     def _decode_header(self, header: Optional[str]) -> str:
         """
         Decode email headers to handle non-ASCII characters
@@ -123,23 +339,24 @@ class IntelligentEmailChatbot:
         """
         
         try:
-            response = self.groq_client.chat.completions.create(
+            response = self.llm.complete(
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": f"Interpret the intent behind: '{user_input}'"}
                 ],
-                model="llama3-8b-8192",
                 max_tokens=150,
-                temperature=0
+                temperature=0,
+                query=user_input
             )
-            return response.choices[0].message.content.strip()
+            return response.strip()
         except Exception as e:
             print(f"Intent analysis error: {e}")
             return "general email search"
 
-    def filter_emails(self, emails: List[Dict[str, str]], intent: str) -> str:
+    def filter_emails(self, emails: List[Dict[str, str]], intent: str, user_input: str = "") -> str:
         """
-        Enhanced email filtering with Groq AI
+        Enhanced email filtering with Groq AI. Routing uses the user's own query, not the
+        LLM-written intent, whose prose always looks complex.
         """
         system_prompt = """
         You are an expert email classifier. For each email:
@@ -154,55 +371,311 @@ class IntelligentEmailChatbot:
         """
         
         try:
-            response = self.groq_client.chat.completions.create(
+            return self.llm.complete(
                 messages=[
                     {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Intent: '{intent}'\n\nEmails:\n" + 
-                        "\n".join([
-                            f"Email {i+1}:\n"
-                            f"Subject: {email['subject']}\n"
-                            f"Sender: {email['sender']}\n"
-                            f"Body Preview: {email['body'][:200]}"
-                            for i, email in enumerate(emails)
-                        ])
-                    }
+                    {"role": "user", "content": f"Intent: '{intent}'\n\nEmails:\n" + self._format_emails(emails)}
                 ],
-                model="llama3-8b-8192",
                 max_tokens=500,
-                temperature=0
+                temperature=0,
+                query=user_input
             )
-            return response.choices[0].message.content
         except Exception as e:
             print(f"Email filtering error: {e}")
             return "No matching emails found."
 
-    def process_request(self, user_input: str) -> str:
+    def rank_emails(self, emails: List[Dict[str, str]], intent: str, user_input: str = "",
+                    email_block: Optional[str] = None) -> List[Dict]:
         """
-        Process user's email search request with AI-powered filtering
+        Score each email against the intent and return structured matches.
+        Pass a pre-rendered email_block to reuse one candidate listing across queries.
         """
-        if not user_input or not isinstance(user_input, str):
-            return "Invalid input provided."
+        system_prompt = """
+        You are an expert email classifier. For each email that matches the given intent:
+        1. Give a relevance score between 0 and 1
+        2. Give a short reason of at most 20 words
+        3. List which of the fields subject, sender and body matched
+        Reply only with a JSON array, one object per matching email, shaped like
+        {"email": <email number>, "score": <0-1>, "reason": "<reason>", "fields": ["subject"]}
+        Leave non-matching emails out. Reply with [] if nothing matches.
+        """
+
+        try:
+            response = self.llm.complete(
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": f"Intent: '{intent}'\n\nEmails:\n" + (email_block or self._format_emails(emails))}
+                ],
+                # Roughly 60 tokens per match object, so long chunks are not cut off mid-array
+                max_tokens=min(4096, 100 + 60 * len(emails)),
+                temperature=0,
+                query=user_input or intent
+            )
+            ranked = self._parse_json_array(response)
+        except Exception as e:
+            print(f"Email ranking error: {e}")
+            return []
+
+        terms = self._query_terms(user_input or intent)
+        matches = []
+        seen = set()
+        for item in ranked:
+            try:
+                position = int(item['email']) - 1
+                score = max(0.0, min(1.0, float(item.get('score', 0))))
+            except (KeyError, TypeError, ValueError):
+                continue
+            if not 0 <= position < len(emails) or position in seen:
+                continue
+            seen.add(position)
+
+            matched = emails[position]
+            fields = [field for field in item.get('fields') or [] if field in ('subject', 'sender', 'body')]
+            matches.append({
+                'uid': matched.get('uid', ''),
+                'message_id': matched.get('message_id', ''),
+                'score': round(score, 3),
+                'reason': str(item.get('reason', '')).strip(),
+                'highlights': {field: self._highlight(matched[field], terms) for field in fields or ['subject']}
+            })
+
+        matches.sort(key=lambda match: match['score'], reverse=True)
+        return matches
+
+    def _format_emails(self, emails: List[Dict[str, str]]) -> str:
+        """
+        Render emails as the numbered list sent to the LLM
+        """
+        return "\n".join([
+            f"Email {i+1}:\n"
+            f"Subject: {email['subject']}\n"
+            f"Sender: {email['sender']}\n"
+            f"Body Preview: {email['body'][:200]}"
+            for i, email in enumerate(emails)
+        ])
+
+    def _parse_json_array(self, content: str) -> List[Dict]:
+        """
+        Pull the objects of a JSON array out of an LLM reply that may carry extra prose
+        or be cut off mid-array; every complete object before the cut is kept
+        """
+        start = content.find('[')
+        if start == -1:
+            return []
+
+        decoder = json.JSONDecoder()
+        items = []
+        position = start + 1
+        while True:
+            position = content.find('{', position)
+            if position == -1:
+                break
+            try:
+                item, position = decoder.raw_decode(content, position)
+            except ValueError:
+                break
+            if isinstance(item, dict):
+                items.append(item)
+        return items
+
+    def _query_terms(self, text: str) -> List[str]:
+        """
+        Words from the query worth highlighting in matched fields
+        """
+        stopwords = {'the', 'and', 'for', 'from', 'with', 'about', 'emails', 'email', 'show', 'find', 'any', 'all'}
+        words = re.findall(r"[\w@.-]{3,}", text.lower())
+        return [word for word in dict.fromkeys(words) if word not in stopwords]
+
+    def _highlight(self, text: str, terms: List[str], width: int = 200) -> str:
+        """
+        Escape a field and wrap query terms in <mark>, trimmed around the first hit
+        """
+        lowered = text.lower()
+        hits = [lowered.find(term) for term in terms if term in lowered]
+        start = max(0, min(hits) - width // 4) if hits else 0
+        snippet = html.escape(text[start:start + width])
+        if not terms:
+            return snippet
+        pattern = "|".join(re.escape(html.escape(term)) for term in sorted(terms, key=len, reverse=True))
+        return re.sub(f"({pattern})", r"<mark>\1</mark>", snippet, flags=re.IGNORECASE)
+
+    def search(self, user_input: str) -> List[Dict]:
+        """
+        Analyze intent while the newest emails are fetched, then return ranked matches
+        """
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future_intent = executor.submit(profiled(self.analyze_intent), user_input)
+            matches, _ = self.search_adaptive(user_input, future_intent)
+        return matches
+
+    def search_adaptive(self, user_input: str, future_intent, target_matches: int = 5, min_score: float = 0.7,
+                        time_budget: float = 20.0, token_budget: int = 12000) -> Tuple[List[Dict], Dict[str, Dict]]:
+        """
+        Rank the mailbox chunk by chunk, newest first, and stop once enough confident matches
+        are found or the time/token budget is spent. Returns the matches and the emails they refer to.
+        """
+        deadline = time.monotonic() + time_budget
+        filters = parse_filters(user_input)
+        include_bulk = self._wants_bulk(user_input, filters)
+        tokens_used = 0
+        matches = []
+        emails_by_uid = {}
+        skipped_bulk = []
 
-        def fetch_emails():
-            return self.get_emails()
+        chunks = self.iter_email_chunks(query=user_input, filters=filters)
+        try:
+            for chunk in chunks:
+                emails_by_uid.update((email['uid'], email) for email in chunk)
+                skipped_bulk.extend(self._skipped_bulk(chunk, include_bulk, len(skipped_bulk)))
+                chunk = self._candidates(chunk, include_bulk)
+                if chunk:
+                    intent = future_intent.result()
+                    email_block = self._format_emails(chunk)
+                    tokens_used += len(email_block) // 4
+
+                    allocation_checkpoint(f"chunk of {len(chunk)} parsed emails and prompt")
+                    matches.extend(self.rank_emails(chunk, intent, user_input, email_block))
+
+                # Checked for empty chunks too, so runs of bulk mail cannot outlast the budget
+                confident = sum(1 for match in matches if match['score'] >= min_score)
+                if confident >= target_matches or time.monotonic() >= deadline or tokens_used >= token_budget:
+                    break
+        finally:
+            chunks.close()
+
+        if not matches and skipped_bulk:
+            matches = self.rank_emails(skipped_bulk, future_intent.result(), user_input)
+
+        matches.sort(key=lambda match: match['score'], reverse=True)
+        return matches, emails_by_uid
+
+    def search_batch(self, queries: List[str], target_matches: int = 5, min_score: float = 0.7,
+                     time_budget: float = 30.0, token_budget: int = 12000) -> Dict[str, List[Dict]]:
+        """
+        Run many queries over shared walks of the mailbox: queries with the same sender/date/flag
+        filters share one walk whose candidates come from the snapshot indexes or IMAP SEARCH,
+        so each chunk is fetched and parsed once per group. Intents are analyzed concurrently,
+        and every query still short of confident matches is ranked against the chunk. Each
+        walk deepens until its queries are satisfied or the time budget is spent.
+        """
+        queries = list(dict.fromkeys(query for query in queries if query and isinstance(query, str)))
+        if not queries:
+            return {}
 
-        def analyze_user_intent():
-            return self.analyze_intent(user_input)
+        deadline = time.monotonic() + time_budget
+        with ThreadPoolExecutor(max_workers=min(len(queries), 8) + 1) as executor:
+            future_intents = {query: executor.submit(profiled(self.analyze_intent), query) for query in queries}
+            groups = {}
+            include_bulk = {}
+            for query in queries:
+                filters = parse_filters(query)
+                groups.setdefault(tuple(sorted(filters.items())), []).append(query)
+                include_bulk[query] = self._wants_bulk(query, filters)
 
+            results = {}
+            for key, group in groups.items():
+                results.update(self._search_shared_chunks(
+                    executor, group, future_intents, include_bulk, self.iter_email_chunks(filters=dict(key)),
+                    deadline, target_matches, min_score, token_budget
+                ))
+            return {query: results[query] for query in queries}
+
+    def _search_shared_chunks(self, executor, queries: List[str], future_intents: Dict, include_bulk: Dict[str, bool],
+                              chunks, deadline: float, target_matches: int, min_score: float,
+                              token_budget: int) -> Dict[str, List[Dict]]:
+        """
+        Rank each chunk for every still-active query, sharing the rendered prompt between
+        queries that end up with the same candidates
+        """
+        results = {query: [] for query in queries}
+        tokens_used = dict.fromkeys(queries, 0)
+        active = list(queries)
+        skipped_bulk = []
         try:
-            with ThreadPoolExecutor(max_workers=2) as executor:
-                future_emails = executor.submit(fetch_emails)
-                future_intent = executor.submit(analyze_user_intent)
+            for chunk in chunks:
+                skipped_bulk.extend(self._skipped_bulk(chunk, False, len(skipped_bulk)))
+                blocks = {}
+                futures = {}
+                for query in active:
+                    candidates = self._candidates(chunk, include_bulk[query])
+                    if not candidates:
+                        continue
+                    key = tuple(email['uid'] for email in candidates)
+                    if key not in blocks:
+                        blocks[key] = self._format_emails(candidates)
+                    tokens_used[query] += len(blocks[key]) // 4
+                    futures[query] = executor.submit(
+                        profiled(self.rank_emails), candidates, future_intents[query].result(), query, blocks[key])
+
+                for query, future in futures.items():
+                    results[query].extend(future.result())
 
-                emails = future_emails.result()
-                if not emails:
-                    return "No emails found."
+                active = [
+                    query for query in active
+                    if sum(1 for match in results[query] if match['score'] >= min_score) < target_matches
+                    and tokens_used[query] < token_budget
+                ]
+                if not active or time.monotonic() >= deadline:
+                    break
+        finally:
+            chunks.close()
+
+        # Queries that found nothing in personal mail get one look at the bulk mail they skipped
+        if skipped_bulk:
+            block = self._format_emails(skipped_bulk)
+            futures = {
+                query: executor.submit(profiled(self.rank_emails), skipped_bulk, future_intents[query].result(), query, block)
+                for query in queries if not include_bulk[query] and not results[query]
+            }
+            for query, future in futures.items():
+                results[query].extend(future.result())
 
-                intent = future_intent.result()
+        for found in results.values():
+            found.sort(key=lambda match: match['score'], reverse=True)
+        return results
 
+    def _wants_bulk(self, user_input: str, filters: Dict) -> bool:
+        """
+        Keep bulk mail when the query asks for it or names a sender, whose mail may all be bulk
+        """
+        return wants_bulk(user_input) or 'address' in filters or 'domain' in filters
+
+    def _candidates(self, emails: List[Dict[str, str]], include_bulk: bool) -> List[Dict[str, str]]:
+        """
+        Drop newsletters, promotions and notifications unless the query asks for them
+        """
+        if include_bulk:
+            return emails
+        return [email for email in emails if email.get('category') != BULK]
+
+    def _skipped_bulk(self, emails: List[Dict[str, str]], include_bulk: bool, kept: int) -> List[Dict[str, str]]:
+        """
+        The bulk mail _candidates drops from emails, up to BULK_FALLBACK_LIMIT across a search
+        """
+        if include_bulk:
+            return []
+        return [email for email in emails if email.get('category') == BULK][:max(0, BULK_FALLBACK_LIMIT - kept)]
+
+    def process_request(self, user_input: str) -> str:
+        """
+        Process user's email search request with AI-powered filtering
+        """
+        if not user_input or not isinstance(user_input, str):
+            return "Invalid input provided."
+
+        try:
             with ThreadPoolExecutor(max_workers=1) as executor:
-                future_filtered_results = executor.submit(self.filter_emails, emails, intent)
-                return future_filtered_results.result()
+                future_intent = executor.submit(profiled(self.analyze_intent), user_input)
+                matches, emails_by_uid = self.search_adaptive(user_input, future_intent)
+
+            if not emails_by_uid:
+                return "No emails found."
+            if not matches:
+                return "No matching emails found."
+
+            # Runs on the request thread: nothing else is left to overlap with
+            matched_emails = [emails_by_uid[match['uid']] for match in matches]
+            return self.filter_emails(matched_emails, future_intent.result(), user_input)
 
         except Exception as e:
             return f"Processing failed: {str(e)}"
@@ -239,3 +712,88 @@ def index(request):
             'response': response,
             'userInput': user_input
         })
+
+def search_api(request):
+    """
+    JSON search: start with ?q= (or a POSTed {"query": ...}) and page with ?cursor=
+    """
+    store = ResultStore()
+    try:
+        page_size = max(1, min(int(request.GET.get('page_size', 10)), 50))
+    except ValueError:
+        return JsonResponse({'error': 'page_size must be an integer'}, status=400)
+
+    cursor = request.GET.get('cursor')
+    if cursor:
+        decoded = decode_cursor(cursor)
+        if decoded is None:
+            return JsonResponse({'error': 'Invalid cursor'}, status=400)
+        page = store.page(decoded[0], decoded[1], page_size)
+        if page is None:
+            return JsonResponse({'error': 'Result set expired, repeat the query'}, status=410)
+        return JsonResponse(page)
+
+    if request.method == 'POST':
+        try:
+            user_input = json.loads(request.body or b'{}').get('query', '')
+        except (ValueError, AttributeError):
+            return JsonResponse({'error': 'Body must be a JSON object'}, status=400)
+    else:
+        user_input = request.GET.get('q', '')
+
+    if not user_input or not isinstance(user_input, str):
+        return JsonResponse({'error': 'Invalid input provided.'}, status=400)
+
+    chatbot = IntelligentEmailChatbot()
+    try:
+        matches = chatbot.search(user_input)
+    except Exception as e:
+        return JsonResponse({'error': f"Processing failed: {str(e)}"}, status=502)
+
+    result_id = store.save(user_input, matches)
+    return JsonResponse(store.page(result_id, 0, page_size))
+
+def batch_api(request):
+    """
+    JSON batch search: POST {"queries": [...]} and get the first page of each result set
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST a JSON body with a "queries" list'}, status=405)
+
+    try:
+        payload = json.loads(request.body or b'{}')
+        queries = payload.get('queries')
+        page_size = max(1, min(int(payload.get('page_size', 10)), 50))
+    except (ValueError, AttributeError, TypeError):
+        return JsonResponse({'error': 'Body must be a JSON object'}, status=400)
+
+    if not isinstance(queries, list) or not queries or len(queries) > 50:
+        return JsonResponse({'error': 'queries must be a list of 1 to 50 strings'}, status=400)
+    if not all(isinstance(query, str) and query for query in queries):
+        return JsonResponse({'error': 'Invalid input provided.'}, status=400)
+
+    store = ResultStore()
+    chatbot = IntelligentEmailChatbot()
+    try:
+        matches_by_query = chatbot.search_batch(queries)
+    except Exception as e:
+        return JsonResponse({'error': f"Processing failed: {str(e)}"}, status=502)
+
+    results = []
+    for query, matches in matches_by_query.items():
+        result_id = store.save(query, matches)
+        results.append(store.page(result_id, 0, page_size))
+    return JsonResponse({'results': results})
+
+def profile_download(request, profile_id):
+    """
+    Staff-only download of a saved request profile (.prof for pstats/snakeviz, ?format=txt for the report)
+    """
+    if not request.user.is_staff:
+        raise Http404()
+    profile_dir = getattr(settings, 'EMAIL_CHATBOT_PROFILE_DIR', '')
+    extension = 'txt' if request.GET.get('format') == 'txt' else 'prof'
+    path = os.path.join(profile_dir, f"{profile_id}.{extension}")
+    if not profile_dir or not os.path.exists(path):
+        raise Http404()
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=os.path.basename(path))